@@ -1,95 +1,354 @@
-import pandas as pd
-import yfinance as yf
-from datetime import datetime, timedelta
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+import os
+import json
+import sqlite3
+import socket
+import shutil
+import heapq
+import bisect
+import csv
+import argparse
+import importlib.util
 import time
 import re
+import threading
+import atexit
+import fcntl
+from contextlib import contextmanager
+from functools import cache
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import asyncio
+from html.parser import HTMLParser
+from urllib.parse import urlparse
 
-    
 
-def setup_driver():
-    """Sets up the Chrome driver in headless mode."""
-    options = Options()
-    options.add_argument("--headless")  # Run in background (headless)
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    options.add_argument("user-agent=Mozilla/5.0")
-    return webdriver.Chrome(options=options)
+class LazyModule:
+    """Imports a module on first attribute access.
 
-def clean_date(s):
-    """Cleans and standardizes the date string."""
-    return re.sub(r'\W+', '', s).lower()
+    pandas, yfinance, selenium and aiohttp take seconds to import between them,
+    and code that only reads constants or helpers from this file never needs them.
+    Query-only consumers should use calendar_core instead.
+    """
 
-yesterday = datetime.now() - timedelta(days=1)
-yesterday_str = yesterday.strftime("%d-%m-%Y")
-yesterday_str_web = yesterday.strftime("%b %d, %Y")
-date_web = yesterday.strftime("%b %d, %Y")
-date_csv = yesterday.strftime("%d-%m-%Y")
-# ─────────────────────────────────────────────────────────────
-# Fetch and update the last available Nifty50 close price
-# ─────────────────────────────────────────────────────────────
+    def __init__(self, name):
+        self._name = name
+        self._module = None
 
-def update_latest_nifty_close(df):
-    driver = setup_driver()
-    driver.get("https://in.investing.com/indices/s-p-cnx-nifty-historical-data")
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
 
-    try:
-        WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-        ).click()
-    except:
-        pass
 
-    table = WebDriverWait(driver, 30).until(
-        EC.presence_of_element_located((By.XPATH, "//table"))
-    )
+pd = LazyModule("pandas")
+np = LazyModule("numpy")
+yf = LazyModule("yfinance")
+webdriver = LazyModule("selenium.webdriver")
+aiohttp = LazyModule("aiohttp")
 
-    rows = table.find_elements(By.XPATH, ".//tbody/tr")
+# Every file the script reads or writes lives next to it, whatever the working directory
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-    nifty_close = None
-    found_date = None
 
-    delta = 1  
-    max_days = 7 
+# Seed profile holding the cookie consent given once. Chrome locks a profile while
+# it runs, so each process copies the seed to .chrome-profile-<pid> and uses that,
+# letting the daemon's warm browser and a manual run's fallback run side by side.
+CHROME_PROFILE_DIR = os.path.join(SCRIPT_DIR, ".chrome-profile")
 
-    while delta <= max_days:
-        check_date = datetime.now() - timedelta(days=delta)
-        check_date_web = check_date.strftime("%b %d, %Y")
-        check_date_csv = check_date.strftime("%d-%m-%Y")
 
-        # print(f"🔎 Checking for {check_date_web}...")
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def process_profile(seed=CHROME_PROFILE_DIR):
+    """This process's copy of the seed profile, made on first use and removed at exit."""
+    path = f"{seed}-{os.getpid()}"
+    if os.path.exists(path):
+        return path
+    # Copies left behind by processes that were killed
+    parent, prefix = os.path.dirname(seed), os.path.basename(seed) + "-"
+    for name in os.listdir(parent):
+        if name.startswith(prefix) and name[len(prefix):].isdigit() and not pid_alive(int(name[len(prefix):])):
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+    if os.path.isdir(seed):
+        # Singleton* are the lock files of a Chrome that is using the seed itself
+        shutil.copytree(seed, path, symlinks=True, ignore=shutil.ignore_patterns("Singleton*"))
+    else:
+        os.makedirs(path)
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+# Requests we never need to read a history table: static media, fonts,
+# stylesheets, and the ad/tracking/consent hosts embedded in investing.com pages
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.css",
+    "*.mp4", "*.webm", "*.m3u8", "*.mp3",
+    "*doubleclick.net*", "*googlesyndication.com*", "*googletagservices.com*",
+    "*googletagmanager.com*", "*google-analytics.com*", "*adservice.google.*",
+    "*amazon-adsystem.com*", "*adnxs.com*", "*pubmatic.com*", "*rubiconproject.com*",
+    "*casalemedia.com*", "*criteo.*", "*taboola.com*", "*outbrain.com*",
+    "*teads.tv*", "*moatads.com*", "*scorecardresearch.com*", "*quantserve.com*",
+    "*facebook.net*", "*hotjar.com*", "*cookielaw.org*", "*onetrust.com*",
+]
+
+def setup_driver(profile_dir=CHROME_PROFILE_DIR, lean=True):
+    """Sets up the Chrome driver in headless mode.
+
+    In lean mode the page load strategy is eager, images and extensions are
+    disabled and BLOCKED_URL_PATTERNS are dropped through the DevTools protocol.
+    """
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")  # Run in background (headless)
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_argument("user-agent=Mozilla/5.0")
+    if profile_dir:
+        options.add_argument(f"--user-data-dir={process_profile(profile_dir)}")
+    if lean:
+        options.page_load_strategy = "eager"  # Don't wait for subresources after DOMContentLoaded
+        options.add_argument("--disable-extensions")
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+    driver = webdriver.Chrome(options=options)
+    if lean:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return driver
 
-        for row in rows:
-            cols = row.find_elements(By.TAG_NAME, "td")
-            if len(cols) >= 2:
-                date_text = cols[0].text.strip()
-                nifty_price = cols[1].text.strip().replace(",", "")
-                if date_text == check_date_web:
-                    nifty_close = float(nifty_price)
-                    found_date = check_date_csv
-                    print(f"📅Found Nifty50 close for {check_date_web}: {nifty_close}")
-                    break
+# ──────────────────────────────
+# Page readiness
+# ──────────────────────────────
 
-        if nifty_close is not None:
-            break 
-        else:
-            delta += 1  
-    driver.quit()
-
-    if nifty_close and found_date:
-        mask = df["Calendar Date"].dt.strftime("%d-%m-%Y") == found_date
-        if mask.any():
-            df.loc[mask, "Nifty50 Close Price"] = nifty_close
-            print(f"✅Nifty50 close price updated for {found_date} in DataFrame.")
-        else:
-            print(f"⚠️ Date {found_date} not found in DataFrame.")
-    else:
-        print("❌ Could not find any Nifty50 close price on website.")
+# Resolves as soon as a table body row has text. A MutationObserver re-checks on
+# every DOM change, and the cookie banner is clicked whenever it shows up, so we
+# never wait for a banner that is not coming.
+ROWS_READY_SCRIPT = """
+const done = arguments[arguments.length - 1];
+function acceptCookies() {
+    const button = document.getElementById('onetrust-accept-btn-handler');
+    if (button && button.offsetParent !== null) button.click();
+}
+function rowsReady() {
+    return Array.from(document.querySelectorAll('table tbody tr'))
+        .some(row => row.innerText.trim().length > 0);
+}
+function check() {
+    acceptCookies();
+    if (rowsReady()) {
+        observer.disconnect();
+        done(true);
+    }
+}
+const observer = new MutationObserver(check);
+observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+check();
+"""
+
+# Reads every body row of the first table in one round trip, as lists of cell texts
+TABLE_ROWS_SCRIPT = """
+const table = document.querySelector('table');
+if (!table) return [];
+return Array.from(table.querySelectorAll('tbody tr'))
+    .map(row => Array.from(row.querySelectorAll('td')).map(cell => cell.innerText.trim()));
+"""
+
+def wait_for_rows(driver, timeout=30):
+    """Waits until the first table has populated rows and returns them as lists of cell texts."""
+    guard = host_guard(driver.current_url)
+    try:
+        driver.set_script_timeout(timeout)
+        driver.execute_async_script(ROWS_READY_SCRIPT)
+        rows = driver.execute_script(TABLE_ROWS_SCRIPT)
+    except Exception:
+        guard.record_failure()
+        raise
+    guard.record_success()
+    return rows
 
-    return df
+# ──────────────────────────────
+# Per-host rate limiting and circuit breaking
+# ──────────────────────────────
+
+# (requests per second, burst) for each host we scrape
+HOST_LIMITS = {
+    "in.investing.com": (0.5, 3),
+    "api.investing.com": (0.5, 3),
+}
+DEFAULT_HOST_LIMIT = (1.0, 4)
+
+FAILURE_THRESHOLD = 3   # consecutive failures before a host's circuit opens
+RESET_AFTER = 300       # seconds an open circuit waits before letting a trial request through
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of contacting a host whose circuit is open."""
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token and returns how many seconds the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and stays open for `reset_after` seconds."""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_after=RESET_AFTER):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = "half-open"  # let one trial request decide
+                return True
+            return self.state == "closed"
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        """A request was cancelled before it could tell us anything, e.g. it lost a hedge."""
+        with self._lock:
+            if self.state == "half-open":
+                # Back to open, already past reset_after, so the next request becomes the trial
+                self.state = "open"
+
+
+class HostGuard:
+    """Rate limiter, circuit breaker and counters for one host."""
+
+    def __init__(self, host, rate, capacity):
+        self.host = host
+        self.bucket = TokenBucket(rate, capacity)
+        self.breaker = CircuitBreaker()
+        self.stats = {"requests": 0, "successes": 0, "failures": 0, "cancelled": 0, "rejected": 0,
+                      "throttled_seconds": 0.0}
+
+    def _reserve(self):
+        if not self.breaker.allow():
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(f"{self.host} circuit is open after repeated failures")
+        wait = self.bucket.reserve()
+        self.stats["requests"] += 1
+        self.stats["throttled_seconds"] += wait
+        return wait
+
+    def acquire(self):
+        """Blocks until a request to the host is allowed. Raises CircuitOpenError if the host is failing."""
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.record_cancelled()
+                raise
+
+    def record_success(self):
+        self.stats["successes"] += 1
+        self.breaker.record_success()
+
+    def record_failure(self):
+        self.stats["failures"] += 1
+        self.breaker.record_failure()
+
+    def record_cancelled(self):
+        self.stats["cancelled"] += 1
+        self.breaker.record_cancelled()
+
+
+_host_guards = {}
+_host_guards_lock = threading.Lock()
+
+def host_guard(url):
+    """Returns the shared HostGuard for the host of `url`."""
+    host = urlparse(url).netloc or url
+    with _host_guards_lock:
+        if host not in _host_guards:
+            rate, capacity = HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT)
+            _host_guards[host] = HostGuard(host, rate, capacity)
+        return _host_guards[host]
+
+def host_stats():
+    """Returns {host: counters and circuit state} for every host contacted so far."""
+    with _host_guards_lock:
+        guards = list(_host_guards.values())
+    return {guard.host: dict(guard.stats, circuit=guard.breaker.state) for guard in guards}
+
+def print_host_stats():
+    for host, stats in host_stats().items():
+        print(
+            f"🌐 {host}: {stats['requests']} requests, {stats['successes']} ok, {stats['failures']} failed, "
+            f"{stats['cancelled']} cancelled, {stats['rejected']} rejected, "
+            f"{stats['throttled_seconds']:.1f}s throttled, circuit {stats['circuit']}"
+        )
+
+def open_page(url, driver=None, timeout=None):
+    """Opens `url` in `driver` (or a new browser), going through the host's rate limiter and circuit breaker.
+
+    `timeout` caps the page load in seconds.
+    """
+    guard = host_guard(url)
+    guard.acquire()
+    own_driver = driver is None
+    if own_driver:
+        driver = setup_driver()
+    try:
+        if timeout is not None:
+            driver.set_page_load_timeout(timeout)
+        driver.get(url)
+    except Exception:
+        guard.record_failure()
+        if own_driver:
+            driver.quit()
+        raise
+    return driver
+
+def clean_date(s):
+    """Cleans and standardizes the date string."""
+    return re.sub(r'\W+', '', s).lower()
 
 # ──────────────────────────────
 # Update Trading Day Column
@@ -665,903 +924,2618 @@ def apply_sensex50_monthly_expiry(df):
     df["BSE Sensex50 Monthly Expiry"] = df["Calendar Date"].map(get_monthly_expiry_status)
     return df
 
-# ───────────────────────────────────────────────
-# Banknifty Close Price
-# ───────────────────────────────────────────────
-def update_latest_banknifty_close(df):
-    driver = setup_driver()
-    driver.get("https://in.investing.com/indices/bank-nifty-historical-data")
-
-    try:
-        WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-        ).click()
-    except:
-        pass
+# ────────────────────────────────────────────────
+# Async scraping core
+# ────────────────────────────────────────────────
+
+# The investing.com historical pages render the price table server side, so a
+# plain HTTP GET is enough to read it. All sources share one event loop and one
+# connection pool instead of one headless browser each.
+HTTP_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+SOURCE_TIMEOUT = 30      # seconds allowed per source
+MAX_CONCURRENCY = 8      # pages in flight at the same time
+
+# Date-ranged history behind the historical data pages, used for backfills
+HISTORY_API_URL = "https://api.investing.com/api/financialdata/historical/{pair_id}"
+BACKFILL_CHUNK_DAYS = 5 * 365   # the API returns at most a few thousand rows per request
+
+
+class HistoryTableParser(HTMLParser):
+    """Collects the cell texts of every body row of the first <table> in a page."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._table_depth = 0
+        self._done = False
+        self._in_body = False
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        if tag == "table":
+            self._table_depth += 1
+        elif self._table_depth == 1 and tag == "tbody":
+            self._in_body = True
+        elif self._in_body and tag == "tr":
+            self._row = []
+        elif self._row is not None and tag == "td":
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if self._done:
+            return
+        if tag == "td" and self._cell is not None:
+            self._row.append(" ".join("".join(self._cell).split()))
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+        elif tag == "tbody":
+            self._in_body = False
+        elif tag == "table":
+            self._table_depth -= 1
+            if self._table_depth == 0:
+                self._done = True
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def parse_history_table(html):
+    """Returns the rows of the historical data table as lists of cell texts."""
+    parser = HistoryTableParser()
+    parser.feed(html)
+    parser.close()
+    return parser.rows
+
+
+def find_latest_close(rows, max_days=7, end_date=None):
+    """Finds the most recent close in the `max_days` days up to `end_date` (default: yesterday)."""
+    end_date = end_date or (datetime.now() - timedelta(days=1)).date()
+    closes = {}
+    for cols in rows:
+        if len(cols) >= 2:
+            closes.setdefault(clean_date(cols[0]), cols[1].replace(",", ""))
+
+    for delta in range(max_days):
+        check_date = end_date - timedelta(days=delta)
+        close_price = closes.get(clean_date(check_date.strftime("%b %d, %Y")))
+        if close_price:
+            return check_date, float(close_price)
+    return None
+
+
+def date_chunks(start, end, days):
+    """Splits the inclusive range start..end into consecutive (first, last) date pairs of at most `days` days."""
+    chunks = []
+    while start <= end:
+        chunk_end = min(start + timedelta(days=days - 1), end)
+        chunks.append((start, chunk_end))
+        start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def record_source(df, column, source, date=None):
+    """Remembers where a column (or one cell of it) came from, for the change feed."""
+    provenance = df.attrs.setdefault("provenance", {})
+    provenance[(date, column) if date else column] = source
+
+
+def apply_close(df, column, found_date, value, source=None):
+    """Writes a close price into the DataFrame row of `found_date`."""
+    mask = df["Calendar Date"].dt.normalize() == pd.Timestamp(found_date)
+    if mask.any():
+        df.loc[mask, column] = value
+        if source:
+            record_source(df, column, source, found_date)
+        print(f"✅{column} updated for {found_date.strftime('%d-%m-%Y')} in DataFrame.")
+    else:
+        print(f"⚠️ Date {found_date.strftime('%d-%m-%Y')} not found in DataFrame.")
+    return df
 
-    table = WebDriverWait(driver, 30).until(
-        EC.presence_of_element_located((By.XPATH, "//table"))
-    )
 
-    rows = table.find_elements(By.XPATH, ".//tbody/tr")
-    banknifty_data = []
+async def fetch_history_async(session, url):
+    """Downloads a historical data page and parses its price table."""
+    async with session.get(url) as response:
+        response.raise_for_status()
+        html = await response.text()
+    return parse_history_table(html)
 
-    for row in rows:
-        cols = row.find_elements(By.TAG_NAME, "td")
-        if len(cols) >= 2:
-            date_text = cols[0].text.strip()
-            close_price = cols[1].text.strip().replace(",", "")
-            banknifty_data.append((date_text, close_price))
 
-    driver.quit()
+class InvestingHistoricalSource:
+    """One investing.com historical data page feeding one calendar column.
 
-    # 🔥 Now search for available date using WHILE LOOP
-    bank_close = None
-    found_date = None
+    Both fetch paths return the table as lists of cell texts, so picking the
+    close and writing it into the calendar is shared by every source.
+    """
 
-    delta = 1
-    max_days = 7   # Search max last 7 days if needed
+    def __init__(self, name, column, url, market, pair_id=None, lookback=7):
+        self.name = name
+        self.column = column
+        self.url = url
+        self.market = market      # key into MARKET_CLOSES, used by the daemon
+        self.pair_id = pair_id    # investing.com instrument id, for date-ranged history
+        self.lookback = lookback  # days to look back over weekends and holidays
 
-    while delta <= max_days:
-        check_date = datetime.now() - timedelta(days=delta)
-        check_date_web = check_date.strftime("%b %d, %Y")
-        check_date_csv = check_date.strftime("%d-%m-%Y")
+    def latest_close(self, rows, end_date=None, max_days=None):
+        return find_latest_close(rows, max_days or self.lookback, end_date)
 
-        # print(f"🔎 Checking for {check_date_web}...")
+    async def fetch_rows_async(self, session, timeout=SOURCE_TIMEOUT, started=None):
+        """Fetches the table over HTTP. Sets `started` once the rate limiter lets the request go."""
+        guard = host_guard(self.url)
+        await guard.acquire_async()
+        if started is not None:
+            started.set()
+        try:
+            rows = await asyncio.wait_for(fetch_history_async(session, self.url), timeout)
+        except asyncio.CancelledError:
+            guard.record_cancelled()
+            raise
+        except Exception:
+            guard.record_failure()
+            raise
+        guard.record_success()
+        price_store().add(self.name, parse_ohlcv_rows(rows))
+        return rows
+
+    async def fetch_range_async(self, session, start, end, timeout=SOURCE_TIMEOUT):
+        """Fetches every daily close from `start` to `end` in BACKFILL_CHUNK_DAYS requests. Returns a Series by date."""
+        closes = {}
+        guard = host_guard(HISTORY_API_URL)
+        for chunk_start, chunk_end in date_chunks(start, end, BACKFILL_CHUNK_DAYS):
+            params = {
+                "start-date": chunk_start.isoformat(), "end-date": chunk_end.isoformat(),
+                "time-frame": "Daily", "add-missing-rows": "false",
+            }
+            await guard.acquire_async()
+            try:
+                url = HISTORY_API_URL.format(pair_id=self.pair_id)
+                async with session.get(url, params=params, headers={"domain-id": "in"},
+                                       timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    response.raise_for_status()
+                    payload = await response.json(content_type=None)
+            except asyncio.CancelledError:
+                guard.record_cancelled()
+                raise
+            except Exception:
+                guard.record_failure()
+                raise
+            guard.record_success()
+            price_store().add(self.name, parse_ohlcv_api(payload.get("data") or []))
+            for row in payload.get("data") or []:
+                closes[pd.Timestamp(row["rowDateTimestamp"][:10])] = float(row["last_closeRaw"])
+        return pd.Series(closes, dtype=float).sort_index()
+
+    def fetch_rows_browser(self, driver=None, timeout=None):
+        """Fetches the table with Chrome, for pages that need JavaScript. Reuses `driver` if given.
+
+        `timeout` bounds the page load and the wait for its rows together.
+        """
+        own_driver = driver is None
+        opened_at = time.monotonic()
+        driver = open_page(self.url, driver, timeout)
+        try:
+            if timeout is None:
+                rows = wait_for_rows(driver)
+            else:
+                rows = wait_for_rows(driver, max(1, timeout - (time.monotonic() - opened_at)))
+            price_store().add(self.name, parse_ohlcv_rows(rows))
+            return rows
+        finally:
+            if own_driver:
+                driver.quit()
+
+    def update_from_browser(self, df, driver=None, end_date=None, max_days=None, timeout=None):
+        """Browser fallback: writes the latest close into the DataFrame. Returns it and what was found."""
+        found = self.latest_close(self.fetch_rows_browser(driver, timeout), end_date, max_days)
+        if found is None:
+            print(f"❌ Could not find any {self.column} on website.")
+            return df, None
+        print(f"📅Found {self.column} for {found[0].strftime('%b %d, %Y')}: {found[1]}")
+        return apply_close(df, self.column, *found, source="investing.com (browser)"), found
+
+
+# One line per ticker: (name, calendar column, historical data page, market, investing.com pair id)
+INVESTING_SOURCES = [
+    InvestingHistoricalSource("nifty", "Nifty50 Close Price", "https://in.investing.com/indices/s-p-cnx-nifty-historical-data", "NSE", 17940),
+    InvestingHistoricalSource("banknifty", "Bank Nifty Close Price", "https://in.investing.com/indices/bank-nifty-historical-data", "NSE", 17950),
+    InvestingHistoricalSource("finnifty", "Fin Nifty Close Price", "https://in.investing.com/indices/cnx-finance-historical-data", "NSE"),
+    InvestingHistoricalSource("vix", "VIX", "https://in.investing.com/indices/india-vix-historical-data", "NSE", 17942),
+    InvestingHistoricalSource("sensex", "SENSEX", "https://in.investing.com/indices/sensex-historical-data", "BSE", 39929),
+    InvestingHistoricalSource("gold", "Gold USD Price", "https://in.investing.com/currencies/xau-usd-historical-data", "COMMODITIES", 68),
+    InvestingHistoricalSource("usdinr", "USD/INR", "https://in.investing.com/currencies/usd-inr-historical-data", "INDIA_FX", 160),
+    InvestingHistoricalSource("eurinr", "EUR/INR", "https://in.investing.com/currencies/eur-inr-historical-data", "INDIA_FX", 1646),
+    InvestingHistoricalSource("india10y", "India 10 Y Bond Yield", "https://in.investing.com/rates-bonds/india-10-year-bond-yield-historical-data", "INDIA_FX", 24014),
+    InvestingHistoricalSource("us10y", "US 10 Y Bond Yield", "https://in.investing.com/rates-bonds/u.s.-10-year-bond-yield-historical-data", "US", 23705),
+    InvestingHistoricalSource("dxy", "Dollar Index", "https://in.investing.com/indices/usdollar-historical-data", "US", 942611),
+    InvestingHistoricalSource("crude", "Crude Oil", "https://in.investing.com/commodities/crude-oil-historical-data", "COMMODITIES", 8849),
+]
+INVESTING_BY_COLUMN = {source.column: source for source in INVESTING_SOURCES}
+INVESTING_BY_NAME = {source.name: source for source in INVESTING_SOURCES}
+PRICE_COLUMNS = [source.column for source in INVESTING_SOURCES]
 
-        for date_text, close_price in banknifty_data:
-            if date_text == check_date_web:
-                bank_close = float(close_price)
-                found_date = check_date_csv
-                print(f"📅Found BankNifty close for {check_date_web}: {bank_close}")
-                break
+# ────────────────
+# Atomic files
+# ────────────────
 
-        if bank_close is not None:
-            break
-        else:
-            delta += 1
+def fsync_directory(path):
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
 
-    if bank_close and found_date:
-        mask = df["Calendar Date"].dt.strftime("%d-%m-%Y") == found_date
-        if mask.any():
-            df.loc[mask, "Bank Nifty Close Price"] = bank_close
-            print(f"✅BankNifty close price updated for {found_date} in DataFrame.")
-        else:
-            print(f"⚠️ Date {found_date} not found in Calendar1.csv.")
-    else:
-        print("❌ Could not find any BankNifty close price.")
 
-    return df
+def atomic_write(path, writer, mode="w"):
+    """Writes `path` through `writer(file)` into a temporary file that is fsynced and renamed over it.
 
+    Readers see either the old file or the new one, never a half-written one.
+    """
+    tmp_path = path + ".tmp"
+    options = {} if "b" in mode else {"encoding": "utf-8", "newline": ""}
+    with open(tmp_path, mode, **options) as tmp:
+        writer(tmp)
+        tmp.flush()
+        os.fsync(tmp.fileno())
+    os.replace(tmp_path, path)
+    fsync_directory(path)
 
-# ───────────────────────────────────────────────
-# Fin Nifty Close Price
-# ───────────────────────────────────────────────
-def update_finnifty_close_price(df):
-    driver = setup_driver()
-    driver.get("https://in.investing.com/indices/cnx-finance-historical-data")
 
-    try:
-        WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-        ).click()
-    except:
-        pass
+class CsvStore(ABC):
+    """A store kept in memory and saved as one CSV of `header` columns and `rows()`."""
+    header = []
 
-    table = WebDriverWait(driver, 30).until(
-        EC.presence_of_element_located((By.XPATH, "//table"))
-    )
+    @abstractmethod
+    def rows(self):
+        """The data rows to save, in file order."""
 
-    rows = table.find_elements(By.XPATH, ".//tbody/tr")
-    finnifty_data = []
+    def save(self):
+        """Rewrites the store atomically if it changed. Returns True if it was written."""
+        if not self.dirty:
+            return False
 
-    for row in rows:
-        cols = row.find_elements(By.TAG_NAME, "td")
-        if len(cols) >= 2:
-            date_text = cols[0].text.strip()
-            close_price = cols[1].text.strip().replace(",", "")
-            finnifty_data.append((date_text, close_price))
+        def write(out):
+            writer = csv.writer(out)
+            writer.writerow(self.header)
+            writer.writerows(self.rows())
 
-    driver.quit()
+        atomic_write(self.path, write)
+        self.dirty = False
+        return True
 
-    # 🔥 Now use while loop to search for available date
-    fin_close = None
-    found_date = None
+# ────────────────
+# OHLCV price store
+# ────────────────
 
-    delta = 1
-    max_days = 7
+# Every history page or API response carries weeks of full OHLCV, not just the
+# one close the calendar needs. All of it is kept in prices/<source>.parquet
+# (or .csv when pyarrow is not installed), one row per date, newest fetch winning.
+PRICE_STORE_DIR = os.path.join(SCRIPT_DIR, "prices")
+OHLCV_FIELDS = ["open", "high", "low", "close", "volume", "change_pct"]
+VOLUME_SUFFIXES = {"K": 1e3, "M": 1e6, "B": 1e9}
 
-    while delta <= max_days:
-        check_date = datetime.now() - timedelta(days=delta)
-        check_date_web = check_date.strftime("%b %d, %Y")
-        check_date_csv = check_date.strftime("%d-%m-%Y")
 
-        # print(f"🔎 Checking for {check_date_web}...")
+def parse_number(text):
+    """'24,328.50' -> 24328.5, '245.32M' -> 245320000.0, '-0.45%' -> -0.45, '-' -> None"""
+    text = text.replace(",", "").replace("%", "").strip()
+    scale = VOLUME_SUFFIXES.get(text[-1:].upper(), 1)
+    if scale != 1:
+        text = text[:-1]
+    try:
+        return float(text) * scale
+    except ValueError:
+        return None
 
-        for date_text, close_price in finnifty_data:
-            if date_text == check_date_web:
-                fin_close = float(close_price)
-                found_date = check_date_csv
-                print(f"📅Found FinNifty close for {check_date_web}: {fin_close}")
-                break
 
-        if fin_close is not None:
-            break
+def parse_ohlcv_rows(rows):
+    """Turns history table rows (Date, Price, Open, High, Low, [Vol.,] Change %) into OHLCV records."""
+    records = []
+    for cols in rows:
+        if len(cols) < 6:
+            continue
+        try:
+            day = datetime.strptime(cols[0], "%b %d, %Y").date()
+        except ValueError:
+            continue
+        records.append({
+            "date": day,
+            "open": parse_number(cols[2]),
+            "high": parse_number(cols[3]),
+            "low": parse_number(cols[4]),
+            "close": parse_number(cols[1]),
+            "volume": parse_number(cols[5]) if len(cols) >= 7 else None,
+            "change_pct": parse_number(cols[-1]),
+        })
+    return records
+
+
+def parse_ohlcv_api(rows):
+    """Turns historical API rows into OHLCV records."""
+    records = []
+    for row in rows:
+        records.append({
+            "date": datetime.strptime(row["rowDateTimestamp"][:10], "%Y-%m-%d").date(),
+            "open": row.get("last_openRaw"),
+            "high": row.get("last_maxRaw"),
+            "low": row.get("last_minRaw"),
+            "close": row.get("last_closeRaw"),
+            "volume": row.get("volumeRaw"),
+            "change_pct": row.get("change_precentRaw"),
+        })
+    return records
+
+
+class PriceStore:
+    """Full daily OHLCV per source, collected during a run and merged into one file per source on flush()."""
+
+    def __init__(self, directory=PRICE_STORE_DIR):
+        self.directory = directory
+        self.use_parquet = importlib.util.find_spec("pyarrow") is not None
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.directory, name + (".parquet" if self.use_parquet else ".csv"))
+
+    def add(self, name, records):
+        if records:
+            with self.lock:
+                self.pending.setdefault(name, []).extend(records)
+
+    def load(self, name):
+        """The stored OHLCV of one source, indexed by date."""
+        path = self.path(name)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=OHLCV_FIELDS, index=pd.DatetimeIndex([], name="date"), dtype=float)
+        if self.use_parquet:
+            return pd.read_parquet(path)
+        return pd.read_csv(path, index_col="date", parse_dates=["date"])
+
+    def flush(self):
+        """Merges the pending rows into each source's file. Returns the number of rows written."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        written = 0
+        os.makedirs(self.directory, exist_ok=True)
+        for name, records in pending.items():
+            fetched = pd.DataFrame.from_records(records)
+            fetched["date"] = pd.to_datetime(fetched["date"])
+            fetched = fetched.set_index("date")[OHLCV_FIELDS].astype(float)
+            stored = self.load(name)
+            merged = pd.concat([stored, fetched]) if len(stored) else fetched
+            merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+
+            if self.use_parquet:
+                atomic_write(self.path(name), merged.to_parquet, mode="wb")
+            else:
+                atomic_write(self.path(name), merged.to_csv)
+            written += len(fetched)
+        if written:
+            print(f"🗃️ Stored {written} OHLCV row(s) for {len(pending)} source(s) in '{self.directory}'.")
+        return written
+
+
+@cache
+def price_store():
+    """The PriceStore shared by every fetch in this process."""
+    return PriceStore()
+
+
+# ────────────────────────────────────────────────
+# yfinance bulk download
+# ────────────────────────────────────────────────
+
+# Yahoo Finance tickers for the calendar columns. There is no Yahoo series
+# for the India 10 Y bond yield, and Gold USD Price is spot XAU/USD while Yahoo
+# only has COMEX futures (GC=F, usually above spot), so both stay with investing.com.
+YF_TICKERS = {
+    "Nifty50 Close Price": "^NSEI",
+    "Bank Nifty Close Price": "^NSEBANK",
+    "Fin Nifty Close Price": "NIFTY_FIN_SERVICE.NS",
+    "VIX": "^INDIAVIX",
+    "SENSEX": "^BSESN",
+    "USD/INR": "INR=X",
+    "EUR/INR": "EURINR=X",
+    "US 10 Y Bond Yield": "^TNX",
+    "Dollar Index": "DX-Y.NYB",
+    "Crude Oil": "CL=F",
+}
+
+YF_CACHE_FILE = os.path.join(SCRIPT_DIR, ".yf_cache", "closes.pkl")
+
+
+def download_closes(tickers, start, end):
+    """Downloads daily closes for all tickers in one threaded multi-ticker call."""
+    data = yf.download(
+        tickers, start=start, end=end, interval="1d", group_by="column",
+        auto_adjust=False, threads=True, progress=False,
+    )
+    if data.empty:
+        return pd.DataFrame(columns=tickers, index=pd.DatetimeIndex([]), dtype=float)
+
+    closes = data["Close"]
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(tickers[0])
+    closes.index = pd.to_datetime(closes.index).tz_localize(None).normalize()
+    return closes.dropna(how="all")
+
+
+def cached_closes(tickers, start, end, cache_file=YF_CACHE_FILE):
+    """Returns closes for [start, end), downloading only the part not already cached.
+
+    The cache holds one wide frame of closes and, per ticker, the date range it
+    covers. A range only counts as covered once the ticker returned rows for it,
+    and the cache is only rewritten after a download that returned data. Today
+    is never cached because its bar is not final until the market closes; if
+    `end` reaches past today, today's closes are downloaded fresh on every call.
+    """
+    today = pd.Timestamp.now().normalize()
+    start = pd.Timestamp(start).normalize()
+    live_end = pd.Timestamp(end).normalize()
+    end = min(live_end, today)
+
+    closes = pd.DataFrame(index=pd.DatetimeIndex([]), dtype=float)
+    covered = {}
+    if os.path.exists(cache_file):
+        cache = pd.read_pickle(cache_file)
+        closes = cache["closes"]
+        covered = cache.get("covered") or {ticker: (cache["start"], cache["end"]) for ticker in closes.columns}
+
+    # Group the missing ranges so tickers that need the same one share a download
+    needed = {}
+    for ticker in tickers:
+        if ticker in covered:
+            covered_start, covered_end = covered[ticker]
+            ranges = [(start, covered_start), (covered_end, end)]
         else:
-            delta += 1
+            ranges = [(start, end)]
+        for first, last in ranges:
+            if first < last:
+                needed.setdefault((first, last), []).append(ticker)
 
-    if fin_close and found_date:
-        mask = df["Calendar Date"].dt.strftime("%d-%m-%Y") == found_date
-        if mask.any():
-            df.loc[mask, "Fin Nifty Close Price"] = fin_close
-            print(f"✅FinNifty close price updated for {found_date} in DataFrame.")
-        else:
-            print(f"⚠️ Date {found_date} not found in Calendar1.csv.")
-    else:
-        print("❌ Could not find any FinNifty close price.")
+    downloaded = False
+    for (first, last), group in needed.items():
+        fetched = download_closes(group, first, last)
+        if fetched.empty:
+            continue
+        closes = fetched.combine_first(closes)
+        for ticker in group:
+            if ticker in fetched.columns and fetched[ticker].notna().any():
+                covered_start, covered_end = covered.get(ticker, (first, last))
+                covered[ticker] = (min(first, covered_start), max(last, covered_end))
+        downloaded = True
 
-    return df
+    if downloaded:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        pd.to_pickle({"covered": covered, "closes": closes}, cache_file)
 
+    window = closes[(closes.index >= start) & (closes.index < end)]
+    if live_end > today:
+        window = download_closes(list(tickers), max(start, today), live_end).combine_first(window)
+    return window.reindex(columns=list(tickers))
 
-# ───────────────────────────────────────────────
-# VIX
-# ───────────────────────────────────────────────
-def update_vix(df):
-    driver = setup_driver()
-    driver.get("https://in.investing.com/indices/india-vix-historical-data")
 
-    try:
-        WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-        ).click()
-    except:
-        pass
+# ────────────────────────────────────────────────
+# Run deadline
+# ────────────────────────────────────────────────
 
-    table = WebDriverWait(driver, 30).until(
-        EC.presence_of_element_located((By.XPATH, "//table"))
-    )
+RUN_DEADLINE = 15 * 60   # seconds a whole run may take, well inside the cron interval
+SOURCE_BUDGET = 90       # seconds any one price column may take
+BROWSER_BUDGET = 60      # seconds to keep in reserve before starting a browser fallback
 
-    rows = table.find_elements(By.XPATH, ".//tbody/tr")
-    vix_data = []
 
-    for row in rows:
-        cols = row.find_elements(By.TAG_NAME, "td")
-        if len(cols) >= 2:
-            date_text = cols[0].text.strip()
-            close_price = cols[1].text.strip().replace(",", "")
-            vix_data.append((date_text, close_price))
+class RunDeadline:
+    """Wall-clock deadline for one run, from which each source gets its budget."""
 
-    driver.quit()
+    def __init__(self, seconds=RUN_DEADLINE):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
 
-    # 🔥 Now use while loop to search for available date
-    vix_close = None
-    found_date = None
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
 
-    delta = 1
-    max_days = 7
+    def expired(self):
+        return self.remaining() == 0
 
-    while delta <= max_days:
-        check_date = datetime.now() - timedelta(days=delta)
-        check_date_web = check_date.strftime("%b %d, %Y")
-        check_date_csv = check_date.strftime("%d-%m-%Y")
+    def budget(self, cap=SOURCE_BUDGET):
+        """Time a source may use: its own cap, but never past the deadline."""
+        return min(cap, self.remaining())
 
-        for date_text, close_price in vix_data:
-            if date_text == check_date_web:
-                vix_close = float(close_price)
-                found_date = check_date_csv
-                print(f"📅Found VIX for {check_date_web}: {vix_close}")
-                break
 
-        if vix_close is not None:
-            break
-        else:
-            delta += 1
+# ────────────────────────────────────────────────
+# Price providers with hedging and failover
+# ────────────────────────────────────────────────
 
-    if vix_close and found_date:
-        mask = df["Calendar Date"].dt.strftime("%d-%m-%Y") == found_date
-        if mask.any():
-            df.loc[mask, "VIX"] = vix_close
-            print(f"✅VIX updated for {found_date} in DataFrame.")
-        else:
-            print(f"⚠️ Date {found_date} not found in Calendar1.csv.")
-    else:
-        print("❌ Could not find any VIX close price.")
+HEDGE_AFTER = 8   # seconds to wait on a source before also starting the next one
+
+# Hand-entered closes, one row per date with calendar column names as headers
+MANUAL_PRICES_FILE = os.path.join(SCRIPT_DIR, "Manual Prices.csv")
+
+
+class PriceSource(ABC):
+    """A place the latest close of a column can come from."""
+    name = "source"
+
+    def covers(self, column):
+        return True
 
-    return df
+    @abstractmethod
+    async def fetch_latest(self, column, end_date=None, max_days=None, started=None):
+        """Returns (date, close) for the most recent close in the window ending at `end_date`, or None.
 
-# ───────────────────────────────────────────────
-# Sensex
-# ───────────────────────────────────────────────
-def update_latest_sensex_close(df):
-    driver = setup_driver()
-    driver.get("https://in.investing.com/indices/sensex-historical-data")
+        Sources that wait for a rate limiter set `started` once their request is
+        sent; the provider's hedge clock starts from then.
+        """
+
+
+def close_window(end_date=None, max_days=None, default_days=7):
+    """Returns the (first, last) dates a close may come from. Defaults to the week up to yesterday."""
+    end_date = end_date or (datetime.now() - timedelta(days=1)).date()
+    return end_date - timedelta(days=(max_days or default_days) - 1), end_date
+
+
+class InvestingSource(PriceSource):
+    """investing.com historical data pages over plain HTTP."""
+    name = "investing.com"
+
+    def __init__(self, session, semaphore, timeout=SOURCE_TIMEOUT, sources=INVESTING_BY_COLUMN):
+        self.session = session
+        self.semaphore = semaphore
+        self.timeout = timeout
+        self.sources = sources
+
+    def covers(self, column):
+        return column in self.sources
+
+    async def fetch_latest(self, column, end_date=None, max_days=None, started=None):
+        source = self.sources[column]
+        async with self.semaphore:
+            rows = await source.fetch_rows_async(self.session, self.timeout, started)
+        return source.latest_close(rows, end_date, max_days)
+
+
+class YFinanceSource(PriceSource):
+    """Yahoo Finance. All columns share one bulk download, made on first use."""
+    name = "yfinance"
+
+    def __init__(self, lookback_days=7):
+        self.lookback_days = lookback_days
+        self._closes = None
+        self._lock = asyncio.Lock()
 
+    def covers(self, column):
+        return column in YF_TICKERS
+
+    async def _bulk_closes(self, end_date=None):
+        async with self._lock:
+            if self._closes is None:
+                # Includes end_date itself, so the daemon's session close is not always a miss
+                last = pd.Timestamp(close_window(end_date)[1])
+                start = last - timedelta(days=self.lookback_days)
+                self._closes = await asyncio.to_thread(
+                    cached_closes, list(YF_TICKERS.values()), start, last + timedelta(days=1)
+                )
+        return self._closes
+
+    async def fetch_latest(self, column, end_date=None, max_days=None, started=None):
+        if started is not None:
+            started.set()
+        closes = await self._bulk_closes(end_date)
+        first, last = close_window(end_date, max_days)
+        series = closes[YF_TICKERS[column]].dropna()
+        series = series[(series.index >= pd.Timestamp(first)) & (series.index <= pd.Timestamp(last))]
+        if series.empty:
+            return None
+        return series.index[-1].date(), float(series.iloc[-1])
+
+
+class LocalFileSource(PriceSource):
+    """Closes typed into MANUAL_PRICES_FILE, for days no website has."""
+    name = "local file"
+
+    def __init__(self, path=MANUAL_PRICES_FILE, lookback_days=7):
+        self.path = path
+        self.lookback_days = lookback_days
+
+    def covers(self, column):
+        return os.path.exists(self.path)
+
+    async def fetch_latest(self, column, end_date=None, max_days=None, started=None):
+        if started is not None:
+            started.set()
+        manual = pd.read_csv(self.path)
+        if column not in manual.columns:
+            return None
+        manual["Date"] = pd.to_datetime(manual["Date"], errors="coerce")
+        first, last = close_window(end_date, max_days or self.lookback_days)
+        in_window = (manual["Date"] >= pd.Timestamp(first)) & (manual["Date"] <= pd.Timestamp(last))
+        recent = manual[in_window & manual[column].notna()].sort_values("Date")
+        if recent.empty:
+            return None
+        return recent["Date"].iloc[-1].date(), float(recent[column].iloc[-1])
+
+
+class ColumnProvider:
+    """Ranked sources for one column.
+
+    The first source starts alone. If it fails, or has not answered within
+    `hedge_after` seconds, the next one is started as well, and so on. The
+    first source to return a close wins and the others are cancelled.
+    """
+
+    def __init__(self, column, sources, hedge_after=HEDGE_AFTER, end_date=None, max_days=None):
+        self.column = column
+        self.sources = [source for source in sources if source.covers(column)]
+        self.hedge_after = hedge_after
+        self.end_date = end_date
+        self.max_days = max_days
+
+    async def fetch(self):
+        """Returns (source name, (date, close)), or (None, None) if every source failed."""
+        remaining = list(self.sources)
+        running = {}
+        started = None   # set once the newest source's request is sent
+
+        def start_next():
+            nonlocal started
+            source = remaining.pop(0)
+            started = asyncio.Event()
+            task = asyncio.create_task(source.fetch_latest(self.column, self.end_date, self.max_days, started))
+            running[task] = source
+
+        if remaining:
+            start_next()
+        try:
+            while running:
+                if remaining and not started.is_set():
+                    # Time spent queueing for our own rate limiter is not a slow source
+                    granted = asyncio.create_task(started.wait())
+                    try:
+                        done, _ = await asyncio.wait({*running, granted}, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        granted.cancel()
+                    done.discard(granted)
+                    if not done:
+                        continue
+                else:
+                    done, _ = await asyncio.wait(
+                        running, timeout=self.hedge_after if remaining else None,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                for task in done:
+                    source = running.pop(task)
+                    if task.exception() is None and task.result() is not None:
+                        return source.name, task.result()
+                    if task.exception() is not None:
+                        print(f"❌ {source.name} failed for {self.column}: {task.exception()!r}")
+                    else:
+                        print(f"❌ {source.name} has no recent {self.column}.")
+
+                # Either a source failed (failover) or nobody answered in time (hedge)
+                if remaining:
+                    if not done:
+                        print(f"⏱️ {self.column}: no answer after {self.hedge_after}s, starting {remaining[0].name}.")
+                    start_next()
+
+            return None, None
+        finally:
+            # Also reached when our own budget runs out and this coroutine is cancelled
+            for task in running:
+                task.cancel()
+
+
+async def fetch_with_budget(provider, budget):
+    """Runs a provider, giving up on it once its budget is spent."""
     try:
-        WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-        ).click()
-    except:
-        pass
+        return await asyncio.wait_for(provider.fetch(), budget)
+    except asyncio.TimeoutError:
+        print(f"⌛ {provider.column} cancelled after its {budget:.0f}s budget.")
+        return None, None
+
+
+async def fetch_with_providers(columns, hedge_after=HEDGE_AFTER, concurrency=MAX_CONCURRENCY, deadline=None,
+                               end_date=None, max_days=None):
+    """Runs one ColumnProvider per column on a single event loop, each within its budget."""
+    deadline = deadline or RunDeadline()
+    semaphore = asyncio.Semaphore(concurrency)
+    async with aiohttp.ClientSession(headers=HTTP_HEADERS) as session:
+        sources = [InvestingSource(session, semaphore), YFinanceSource(), LocalFileSource()]
+        providers = [ColumnProvider(column, sources, hedge_after, end_date, max_days) for column in columns]
+        results = await asyncio.gather(*(fetch_with_budget(provider, deadline.budget()) for provider in providers))
+    return dict(zip(columns, results))
+
+
+def update_prices(df, columns=None, hedge_after=HEDGE_AFTER, deadline=None, end_date=None, max_days=None):
+    """Updates the price columns through their providers. Returns the DataFrame and the columns that failed.
+
+    By default each column takes its latest close from the week up to yesterday;
+    `end_date` and `max_days` narrow that window.
+    """
+    columns = list(columns or PRICE_COLUMNS)
+    results = asyncio.run(fetch_with_providers(columns, hedge_after, deadline=deadline,
+                                               end_date=end_date, max_days=max_days))
+
+    missing = []
+    for column, (source_name, found) in results.items():
+        if found is None:
+            print(f"❌ Could not find any {column} from any source.")
+            missing.append(column)
+            continue
+        found_date, value = found
+        print(f"📅Found {column} for {found_date.strftime('%b %d, %Y')} from {source_name}: {value}")
+        df = apply_close(df, column, found_date, value, source_name)
+    return df, missing
 
-    table = WebDriverWait(driver, 30).until(
-        EC.presence_of_element_located((By.XPATH, "//table"))
-    )
 
-    rows = table.find_elements(By.XPATH, ".//tbody/tr")
-    sensex_data = []
+# ────────────────
+# Storage
+# ────────────────
 
-    for row in rows:
-        cols = row.find_elements(By.TAG_NAME, "td")
-        if len(cols) >= 2:
-            date_text = cols[0].text.strip()
-            close_price = cols[1].text.strip().replace(",", "")
-            sensex_data.append((date_text, close_price))
+CALENDAR_FILE = os.path.join(SCRIPT_DIR, "Calendar.csv")
+COMPACT_AFTER = 2000   # delta log lines before they are folded into the snapshot
 
-    driver.quit()
 
-    # 🔥 Now use while loop to find last available close
-    sensex = None
-    found_date = None
+def read_snapshot(path):
+    df = pd.read_csv(path)
+    df["Calendar Date"] = pd.to_datetime(df["Calendar Date"], errors="coerce")
+    # A few pasted values like "3,424.30" would otherwise turn a whole price column into text
+    for column in PRICE_COLUMNS:
+        if df[column].dtype != float:
+            df[column] = pd.to_numeric(df[column].astype(str).str.replace(",", "").str.strip(), errors="coerce")
+    return df
 
-    delta = 1
-    max_days = 7  # Max lookback if consecutive holidays
 
-    while delta <= max_days:
-        check_date = datetime.now() - timedelta(days=delta)
-        check_date_web = check_date.strftime("%b %d, %Y")
-        check_date_csv = check_date.strftime("%d-%m-%Y")
+def to_json_value(value):
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def diff_cells(before, after):
+    """Returns [(date, column, old, new)] for every cell that differs, rows matched on Calendar Date."""
+    old_rows = before.dropna(subset=["Calendar Date"]).set_index("Calendar Date")
+    new_rows = after.dropna(subset=["Calendar Date"]).set_index("Calendar Date")
+    old_rows = old_rows.reindex(new_rows.index)
+
+    changes = []
+    for column in new_rows.columns:
+        if column not in old_rows.columns:
+            continue
+        old, new = old_rows[column], new_rows[column]
+        differs = ~((old == new) | (old.isna() & new.isna()))
+        for date in new_rows.index[differs.to_numpy()]:
+            changes.append((date.date(), column, to_json_value(old[date]), to_json_value(new[date])))
+    return changes
+
+
+def replay_cells(current, hit, values):
+    """`current` with the logged `values` where `hit`, cast to the column's type.
+
+    The log stores one JSON value per cell, so a column may come back as all
+    None (cleared cells) or as text; numeric columns are converted before
+    assigning, and integer columns stay integer while every value is whole.
+    """
+    if not pd.api.types.is_numeric_dtype(current):
+        return current.astype(object).mask(hit, values)
+    updated = current.mask(hit, pd.to_numeric(values, errors="coerce"))
+    if pd.api.types.is_integer_dtype(current) and updated.notna().all() and (updated % 1 == 0).all():
+        updated = updated.astype(current.dtype)
+    return updated
+
+
+class CalendarStore:
+    """Calendar.csv as a snapshot plus an append-only log of changed cells.
+
+    Each save appends one JSON line per changed cell and fsyncs it. Once the log
+    reaches `compact_after` lines it is folded into a new snapshot, written to a
+    temporary file and renamed over the old one, so the CSV is never half-written.
+    A crash between the rename and the log truncation only replays cells that
+    are already in the snapshot.
+
+    Saves and compactions hold an exclusive flock on the delta log, so runs in
+    other processes cannot interleave with them. If another process changed the
+    snapshot or log since load(), compaction merges its cells in first.
+    """
+
+    def __init__(self, path=CALENDAR_FILE, compact_after=COMPACT_AFTER):
+        self.path = path
+        self.delta_path = os.path.splitext(path)[0] + ".delta.jsonl"
+        self.compact_after = compact_after
+        self._baseline = None
+        self._on_disk = None
+
+    @contextmanager
+    def locked(self, operation=fcntl.LOCK_EX):
+        """Holds a flock on the delta log (created if missing) and yields it opened for appending."""
+        with open(self.delta_path, "a", encoding="utf-8") as log:
+            fcntl.flock(log.fileno(), operation)
+            try:
+                yield log
+            finally:
+                fcntl.flock(log.fileno(), fcntl.LOCK_UN)
+
+    def disk_state(self):
+        """(mtime, size) of the snapshot and the delta log, to tell whether another process wrote them."""
+        state = []
+        for path in (self.path, self.delta_path):
+            try:
+                stat = os.stat(path)
+                state.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+
+    def read_deltas(self):
+        deltas = []
+        if not os.path.exists(self.delta_path):
+            return deltas
+        with open(self.delta_path, encoding="utf-8") as log:
+            for line in log:
+                try:
+                    deltas.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f"⚠️ Skipping a torn line in {self.delta_path}.")
+        return deltas
+
+    def read(self):
+        """The snapshot with the delta log applied."""
+        df = read_snapshot(self.path)
+        deltas = self.read_deltas()
+        if deltas:
+            dates = df["Calendar Date"].dt.normalize()
+            log = pd.DataFrame(deltas).drop_duplicates(["date", "column"], keep="last")
+            for column, cells in log.groupby("column"):
+                if column not in df.columns:
+                    continue
+                values = pd.Series(cells["value"].to_numpy(), index=pd.to_datetime(cells["date"]))
+                hit = dates.isin(values.index)
+                df[column] = replay_cells(df[column], hit, dates.map(values))
+        return df
 
-        # print(f"🔎 Checking for {check_date_web}...")
+    def load(self):
+        with self.locked(fcntl.LOCK_SH):
+            df = self.read()
+            self._on_disk = self.disk_state()
+        self._baseline = df.copy()
+        return df
 
-        for date_text, close_price in sensex_data:
-            if date_text == check_date_web:
-                sensex = float(close_price)
-                found_date = check_date_csv
-                print(f"📅Found SENSEX for {check_date_web}: {sensex}")
-                break
+    def save(self, df):
+        """Appends the cells changed since load() to the delta log. Returns the changes."""
+        if self._baseline is None:
+            self.load()
+        changes = diff_cells(self._baseline, df)
+        with self.locked() as log:
+            unchanged = self.disk_state() == self._on_disk
+            if changes:
+                for date, column, old, new in changes:
+                    log.write(json.dumps({"date": date.isoformat(), "column": column, "value": new}) + "\n")
+                log.flush()
+                os.fsync(log.fileno())
+                if unchanged:
+                    self._on_disk = self.disk_state()
+            if self.delta_lines() >= self.compact_after:
+                self._compact(log, df)
+            else:
+                self._baseline = df.copy()
+        return changes
 
-        if sensex is not None:
-            break
+    def delta_lines(self):
+        if not os.path.exists(self.delta_path):
+            return 0
+        with open(self.delta_path, "rb") as log:
+            return sum(1 for _ in log)
+
+    def compact(self, df=None):
+        """Writes snapshot + deltas as the new snapshot and empties the delta log."""
+        with self.locked() as log:
+            self._compact(log, df)
+
+    def merge_from_disk(self, df):
+        """`df` with the cells and rows other processes saved since load() applied to it."""
+        fresh = self.read()
+        merged = df.copy()
+        rows = pd.Series(merged.index, index=merged["Calendar Date"])
+        for date, column, old, new in diff_cells(self._baseline, fresh):
+            if pd.Timestamp(date) in rows.index:
+                merged.at[rows[pd.Timestamp(date)], column] = new
+        added = fresh[~fresh["Calendar Date"].isin(merged["Calendar Date"])]
+        if not added.empty:
+            merged = pd.concat([merged, added], ignore_index=True).sort_values("Calendar Date", ignore_index=True)
+        print(f"🔀 '{self.path}' changed in another process since it was loaded; merged before compacting.")
+        return merged
+
+    def _compact(self, log, df):
+        if df is None or self._baseline is None:
+            df = merged = self.read()
+        elif self.disk_state() != self._on_disk:
+            merged = self.merge_from_disk(df)
         else:
-            delta += 1
+            merged = df
+        atomic_write(self.path, lambda out: merged.to_csv(out, index=False))
+        log.truncate(0)
+        log.flush()
+        os.fsync(log.fileno())
+        self._on_disk = self.disk_state()
+        # The baseline stays what the caller holds, so the next save only logs the caller's own edits
+        self._baseline = df.copy()
+        print(f"🗜️ Compacted the delta log into '{self.path}'.")
+
+
+@cache
+def calendar_store(path=CALENDAR_FILE):
+    """Returns the CalendarStore for `path`, shared by every read and write in this process."""
+    return CalendarStore(path)
 
-    if sensex and found_date:
-        mask = df["Calendar Date"].dt.strftime("%d-%m-%Y") == found_date
-        if mask.any():
-            df.loc[mask, "SENSEX"] = sensex
-            print(f"✅SENSEX updated for {found_date} in DataFrame.")
-        else:
-            print(f"⚠️ Date {found_date} not found in Calendar1.csv.")
-    else:
-        print("❌ Could not find any SENSEX close price.")
+# ────────────────
+# Change feed
+# ────────────────
 
-    return df
+# Downstream consumers either tail <calendar>.changes.jsonl from a saved byte
+# offset with follow_changes(), or, while the daemon runs, connect to
+# CHANGE_SOCKET and receive the same JSON lines as they are written.
+CHANGE_SOCKET = os.path.join(SCRIPT_DIR, "calendar-changes.sock")
 
 
+def change_feed_path(path=CALENDAR_FILE):
+    return os.path.splitext(path)[0] + ".changes.jsonl"
 
-# ───────────────────────────────────────────────
-# Gold USD Price
-# ───────────────────────────────────────────────
 
-def update_latest_gold_close(df):
-    def fetch_gold_price(date_str_web):
-        """Fetches the gold close price from the investing.com historical data page."""
-        try:
-            driver = setup_driver()
-            driver.get("https://in.investing.com/currencies/xau-usd-historical-data")
-            # print("🌐 Opened investing.com page...")
+class ChangeFeedServer:
+    """Pushes change lines to every client connected to a Unix socket."""
 
+    def __init__(self, socket_path=CHANGE_SOCKET):
+        self.socket_path = socket_path
+        self.clients = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # left over from a previous daemon
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        self._server.listen()
+        threading.Thread(target=self._accept, daemon=True).start()
+        print(f"📡 Change feed listening on {self.socket_path}")
+
+    def _accept(self):
+        while True:
             try:
-                WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-                ).click()
-                # print("🍪 Accepted cookies.")
-            except:
-                print("✅ No cookie popup or already accepted.")
-
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.XPATH, "//table//tbody/tr"))
-            )
+                client, _ = self._server.accept()
+            except OSError:
+                return  # server closed
+            with self._lock:
+                self.clients.append(client)
+
+    def publish(self, lines):
+        payload = "".join(lines).encode("utf-8")
+        with self._lock:
+            for client in list(self.clients):
+                try:
+                    client.sendall(payload)
+                except OSError:
+                    self.clients.remove(client)
+                    client.close()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        with self._lock:
+            for client in self.clients:
+                client.close()
+            self.clients = []
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+change_server = None   # set while the daemon runs
+
+
+def publish_changes(changes, provenance, path=CALENDAR_FILE):
+    """Appends one JSON line per changed cell to the change feed and pushes them to socket clients."""
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+    lines = []
+    for date, column, old, new in changes:
+        source = provenance.get((date, column)) or provenance.get(column) or "unknown"
+        lines.append(json.dumps({
+            "run_id": run_id, "date": date.isoformat(), "column": column,
+            "old": old, "new": new, "source": source,
+        }) + "\n")
+
+    with open(change_feed_path(path), "a", encoding="utf-8") as feed:
+        feed.writelines(lines)
+        feed.flush()
+        os.fsync(feed.fileno())
+    if change_server is not None:
+        change_server.publish(lines)
+    print(f"📣 Published {len(lines)} change(s).")
+
+
+def follow_changes(path=CALENDAR_FILE, offset=0, poll_seconds=1.0, stop_at_end=False):
+    """Yields (next offset, change dict) from the change feed, starting at byte `offset`.
+
+    Consumers store the offset after applying a change and pass it back on restart.
+    """
+    feed_path = change_feed_path(path)
+    while True:
+        if os.path.exists(feed_path):
+            with open(feed_path, "rb") as feed:
+                feed.seek(offset)
+                for line in feed:
+                    if not line.endswith(b"\n"):
+                        break  # still being written
+                    offset += len(line)
+                    yield offset, json.loads(line)
+        if stop_at_end:
+            return
+        time.sleep(poll_seconds)
 
-            rows = driver.find_elements(By.XPATH, "//table//tbody/tr")
+# ────────────────
+# Calendar stages
+# ────────────────
 
-            for _ in range(10):
-                if any(row.text.strip() for row in rows):
-                    break
-                # print("⌛ Waiting for data to populate...")
-                time.sleep(1)
+# Expiry stages in the order main() has always run them
+EXPIRY_STAGES = [
+    (apply_weekly_expiry, "NSE Nifty Weekly Expiry"),
+    (apply_nifty_monthly_expiry, "NSE Nifty Monthly Expiry"),
+    (apply_banknifty_weekly_expiry, "NSE BankNifty Weekly Expiry"),
+    (apply_banknifty_monthly_expiry, "NSE BankNifty Monthly Expiry"),
+    (apply_FinNifty_weekly_expiry, "NSE FinNifty Weekly Expiry"),
+    (apply_finnifty_monthly_expiry, "NSE FinNifty Monthly Expiry"),
+    (apply_bse_sensex_weekly_expiry, "BSE Sensex Weekly Expiry"),
+    (apply_bse_sensex_monthly_expiry, "BSE Sensex Monthly Expiry"),
+    (apply_sensex50_monthly_expiry, "BSE Sensex50 Monthly Expiry"),
+    (bse_bankex_weekly_expiry, "BSE Bankex Weekly Expiry"),
+    (bse_bankex_monthly_expiry, "BSE Bankex Monthly Expiry"),
+    (bse_sensex50_weekly_expiry, "BSE Sensex50 Weekly Expiry"),
+]
 
-            for idx, row in enumerate(rows):
-                cols = row.find_elements(By.TAG_NAME, "td")
-                if len(cols) >= 2:
-                    date_text = cols[0].text.strip()
-                    close_price = cols[1].text.strip().replace(",", "")
-                    if clean_date(date_text) == clean_date(date_str_web):
-                        driver.quit()
-                        return float(close_price), date_text
+# ────────────────
+# Expiry store
+# ────────────────
 
-            driver.quit()
-            return None, None
+# Expiries are kept long, one (instrument_id, cadence, expiry_date) row each, in
+# Expiries.csv. The wide 0/1 columns in Calendar.csv are rendered from it for the
+# instruments that always had one; instruments added to EXPIRY_RULES later only
+# cost their own rows and never widen the calendar.
+EXPIRY_FILE = os.path.join(SCRIPT_DIR, "Expiries.csv")
+
+
+def expiry_key(column):
+    """'NSE BankNifty Weekly Expiry' -> ('NSE BankNifty', 'weekly')"""
+    instrument, cadence, _ = column.rsplit(" ", 2)
+    return instrument, cadence.lower()
+
+
+def expiry_column(instrument, cadence):
+    return f"{instrument} {cadence.title()} Expiry"
+
+
+def wide_rule(stage, column):
+    """Turns one of the wide-column expiry functions into a rule that returns its expiry dates."""
+    def rule(df):
+        frame = stage(df[["Calendar Date", "Trading Day"]].copy())
+        return set(frame.loc[frame[column] == 1, "Calendar Date"].dt.date)
+    return rule
+
+
+# (instrument_id, cadence) -> rule(df) returning the set of expiry dates
+EXPIRY_RULES = {expiry_key(column): wide_rule(stage, column) for stage, column in EXPIRY_STAGES}
+WIDE_EXPIRY_COLUMNS = [column for _, column in EXPIRY_STAGES]
+
+
+class ExpiryStore(CsvStore):
+    """Expiry dates indexed by (instrument_id, cadence) and by date."""
+    header = ["instrument_id", "cadence", "expiry_date"]
+
+    def __init__(self, path=EXPIRY_FILE):
+        self.path = path
+        self.by_instrument = {}   # (instrument_id, cadence) -> sorted [date]
+        self.by_date = {}         # date -> {(instrument_id, cadence)}
+        self.dirty = False
+        if os.path.exists(path):
+            self.load()
+
+    def load(self):
+        grouped = {}
+        with open(self.path, newline="", encoding="utf-8") as store:
+            for row in csv.DictReader(store):
+                day = datetime.strptime(row["expiry_date"], "%Y-%m-%d").date()
+                grouped.setdefault((row["instrument_id"], row["cadence"]), []).append(day)
+        for key, days in grouped.items():
+            self._set(key, sorted(set(days)))
+        self.dirty = False
+
+    def _set(self, key, days):
+        for day in self.by_instrument.get(key, []):
+            self.by_date[day].discard(key)
+            if not self.by_date[day]:
+                del self.by_date[day]
+        self.by_instrument[key] = days
+        for day in days:
+            self.by_date.setdefault(day, set()).add(key)
+
+    def replace(self, instrument, cadence, days):
+        """Sets all expiries of one instrument and cadence. Returns True if any changed."""
+        days = sorted(set(days))
+        if self.by_instrument.get((instrument, cadence)) == days:
+            return False
+        self._set((instrument, cadence), days)
+        self.dirty = True
+        return True
+
+    def import_wide(self, df):
+        """Seeds the store from the wide expiry columns of an existing calendar."""
+        for column in WIDE_EXPIRY_COLUMNS:
+            if column in df.columns:
+                self.replace(*expiry_key(column), df.loc[df[column] == 1, "Calendar Date"].dropna().dt.date)
+
+    def expiries(self, instrument, cadence, start=None, end=None):
+        days = self.by_instrument.get((instrument, cadence), [])
+        lo = bisect.bisect_left(days, start) if start else 0
+        hi = bisect.bisect_right(days, end) if end else len(days)
+        return days[lo:hi]
+
+    def on(self, day):
+        """(instrument_id, cadence) of everything expiring on `day`."""
+        return sorted(self.by_date.get(day, ()))
+
+    def rows(self):
+        for (instrument, cadence), days in sorted(self.by_instrument.items()):
+            for day in days:
+                yield instrument, cadence, day.isoformat()
+
+    def wide(self, dates, keys=None):
+        """0/1 expiry columns for a Series of dates: the old wide layout, rendered on demand."""
+        days = dates.dt.date
+        keys = self.by_instrument if keys is None else keys
+        return pd.DataFrame(
+            {expiry_column(*key): days.isin(self.by_instrument.get(key, [])).astype(int) for key in keys},
+            index=dates.index,
+        )
 
-        except Exception as e:
-            # print(f"❌ Error while scraping: {e}")
-            return None, None
 
-    # ──────────────────────────────
-    # Actual update logic with while loop
-    # ──────────────────────────────
+@cache
+def expiry_store():
+    """The ExpiryStore shared by every read and write in this process."""
+    return ExpiryStore()
 
-    price = None
-    matched_date = None
+# ────────────────
+# Parallel expiry generation
+# ────────────────
 
-    delta = 1
-    max_days = 7  # Max lookback if consecutive holidays
+# Expiry rules only read Calendar Date and Trading Day. Those two arrays go
+# into shared memory once; each pool worker rebuilds its small frame from them
+# and runs whole instruments, so nothing but rule keys and date lists is pickled.
+EXPIRY_WORKERS = os.cpu_count() or 1
 
-    while delta <= max_days:
-        check_date = datetime.now() - timedelta(days=delta)
-        check_date_web = check_date.strftime("%b %d, %Y")
-        check_date_csv = check_date.strftime("%d-%m-%Y")
+_worker_frame = None
 
-        # print(f"🔎 Checking for Gold price on {check_date_web}...")
 
-        price, matched_date = fetch_gold_price(check_date_web)
+def attach_calendar(dates_name, trading_name, rows):
+    """Pool initializer: builds the worker's frame from the shared arrays."""
+    global _worker_frame
+    dates_block = shared_memory.SharedMemory(name=dates_name)
+    trading_block = shared_memory.SharedMemory(name=trading_name)
+    try:
+        dates = np.ndarray(rows, dtype="datetime64[ns]", buffer=dates_block.buf)
+        trading = np.ndarray(rows, dtype=np.float64, buffer=trading_block.buf)
+        _worker_frame = pd.DataFrame({"Calendar Date": dates.copy(), "Trading Day": trading.copy()})
+    finally:
+        dates_block.close()
+        trading_block.close()
 
-        if price:
-            break
-        else:
-            delta += 1
-
-    if price and matched_date:
-        mask = df["Calendar Date"].dt.strftime("%d-%m-%Y") == check_date_csv
-        if mask.any():
-            df.loc[mask, "Gold USD Price"] = price
-            print(f"✅Found Gold USD close for {matched_date}: {price}")
-            print("✅Gold USD Close Price updated in DataFrame.")
-        else:
-            print(f"⚠️Date {check_date_csv} not found in DataFrame.")
-    else:
-        print("❌ Could not fetch Gold close price.")
 
-    return df
+def run_rule(key):
+    return key, sorted(EXPIRY_RULES[key](_worker_frame))
 
-# ───────────────────────────────────────────────
-# USD/INR
-# ───────────────────────────────────────────────
 
-def update_latest_usdinr_close(df):
-    def fetch_usdinr_price(date_str_web):
-        """Fetches the USD/INR close price from the investing.com historical data page."""
-        try:
-            driver = setup_driver()
-            driver.get("https://in.investing.com/currencies/usd-inr-historical-data")
+def share_array(values):
+    block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+    return block
 
-            try:
-                WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-                ).click()
-                # print("🍪 Accepted cookies.")
-            except:
-                print("✅No cookie popup or already accepted.")
-
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.XPATH, "//table//tbody/tr"))
-            )
 
-            rows = driver.find_elements(By.XPATH, "//table//tbody/tr")
+def generate_expiries(df, keys, workers=None):
+    """Runs the expiry rules for `keys`. Returns {key: sorted dates}.
 
-            for _ in range(10):
-                if any(row.text.strip() for row in rows):
-                    break
-                # print("⌛ Waiting for data to populate...")
-                time.sleep(1)
+    With more than one worker the rules fan out over a process pool, one
+    instrument per task; otherwise they run here.
+    """
+    workers = min(workers or EXPIRY_WORKERS, len(keys))
+    if workers <= 1:
+        return {key: sorted(EXPIRY_RULES[key](df)) for key in keys}
 
-            for idx, row in enumerate(rows):
-                cols = row.find_elements(By.TAG_NAME, "td")
-                if len(cols) >= 2:
-                    date_text = cols[0].text.strip()
-                    close_price = cols[1].text.strip().replace(",", "")
-                    if clean_date(date_text) == clean_date(date_str_web):
-                        driver.quit()
-                        return float(close_price), date_text
+    dates = df["Calendar Date"].to_numpy(dtype="datetime64[ns]")
+    trading = pd.to_numeric(df["Trading Day"], errors="coerce").to_numpy(dtype=np.float64)
+    blocks = [share_array(dates), share_array(trading)]
+    try:
+        with ProcessPoolExecutor(workers, initializer=attach_calendar,
+                                 initargs=(blocks[0].name, blocks[1].name, len(df))) as pool:
+            return dict(pool.map(run_rule, keys))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+
+def read_calendar(path=CALENDAR_FILE):
+    """Reads the calendar: the snapshot with its delta log applied."""
+    df = calendar_store(path).load()
+    store = expiry_store()
+    if not store.by_instrument:
+        # First run with the long store: seed it from the wide columns
+        store.import_wide(df)
+    events = event_store()
+    if not events.events:
+        events.import_dense(df)
+    return df
 
-            driver.quit()
-            return None, None
+def write_calendar(df, path=CALENDAR_FILE):
+    """Persists the cells that changed since the calendar was read and publishes them on the change feed."""
+    changes = calendar_store(path).save(df)
+    expiry_store().save()
+    event_store().save()
+    price_store().flush()
+    if changes:
+        publish_changes(changes, df.attrs.get("provenance", {}), path)
+    df.attrs["provenance"] = {}
+    return changes
+
+def expiry_stage_name(column):
+    """'NSE BankNifty Monthly Expiry' -> 'banknifty-monthly'"""
+    return "-".join(column.lower().split()[1:-1])
+
+def recompute_calendar(df, trading_day=True, expiries=None, workers=None):
+    """Recomputes the Trading Day and expiry columns from the prices already in the DataFrame.
+
+    Expiry rules write to the long expiry store; the columns that have always
+    been in the CSV are then rendered from it. `expiries` limits the rules to
+    those columns; by default all of them run, over `workers` processes.
+    """
+    if trading_day:
+        df = update_trading_day(df)
+        record_source(df, "Trading Day", "trading day rule")
+        print("✅Trading Day Column Updated Successfully!")
+    store = expiry_store()
+    keys = [key for key in EXPIRY_RULES if expiries is None or expiry_column(*key) in expiries]
+    for key, days in generate_expiries(df, keys, workers).items():
+        column = expiry_column(*key)
+        store.replace(*key, days)
+        if column in WIDE_EXPIRY_COLUMNS:
+            df[column] = store.wide(df["Calendar Date"], [key])[column]
+            record_source(df, column, "expiry rules")
+        print(f"✅{column} Column Updated Successfully!")
+    return df
 
+def browser_fallback(df, columns, deadline=None, driver=None, end_date=None, max_days=None):
+    """Tries the browser for each column no provider could fetch. Returns the DataFrame and what is still missing.
+
+    `driver` may be a function returning the driver, so it is only started if a column needs it.
+    """
+    still_missing = []
+    for column in columns:
+        if deadline is not None and deadline.remaining() < BROWSER_BUDGET:
+            print(f"⏰ No time left for a browser fallback for {column}.")
+            still_missing.append(column)
+            continue
+        print(f"🔁 Falling back to browser for {column}...")
+        try:
+            if callable(driver):
+                driver = driver()   # started here, so a browser that fails to launch is one failed column
+            timeout = deadline.budget(BROWSER_BUDGET) if deadline is not None else None
+            df, found = INVESTING_BY_COLUMN[column].update_from_browser(df, driver, end_date, max_days, timeout)
         except Exception as e:
-            print(f"❌ Error while scraping: {e}")
-            return None, None
+            print(f"❌ Browser fallback failed for {column}: {e}")
+            found = None
+        if found is None:
+            still_missing.append(column)
+    return df, still_missing
 
-    # ──────────────────────────────
-    # Actual update logic with while loop
-    # ──────────────────────────────
+# ────────────────
+# Shared calendar arrays
+# ────────────────
 
-    price = None
-    matched_date = None
+# Backtest workers memory-map these .npy files instead of parsing Calendar.csv,
+# so every process on the host shares the same pages through the OS cache.
+SHARED_CALENDAR_DIR = os.path.join(SCRIPT_DIR, "calendar_arrays")
+KEEP_VERSIONS = 2   # published versions kept so attached workers are never pulled from under
+
+
+def array_file(column):
+    return re.sub(r"\W+", "_", column).strip("_").lower() + ".npy"
+
+
+def flag_columns():
+    return ["Trading Day"] + WIDE_EXPIRY_COLUMNS
+
+
+def publish_calendar_arrays(df, directory=SHARED_CALENDAR_DIR):
+    """Writes dates, flags and prices as .npy files and points CURRENT at them. Returns the version directory."""
+    rows = df.dropna(subset=["Calendar Date"])
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    target = os.path.join(directory, version)
+    os.makedirs(target + ".tmp")
+
+    manifest = {"rows": len(rows), "dates": "dates.npy", "flags": {}, "prices": {}}
+    # Second resolution is a unit pandas keeps as is, so SharedCalendar.frame() does not copy the dates
+    np.save(os.path.join(target + ".tmp", "dates.npy"), rows["Calendar Date"].to_numpy().astype("datetime64[s]"))
+    for column in flag_columns():
+        manifest["flags"][column] = array_file(column)
+        np.save(os.path.join(target + ".tmp", array_file(column)), rows[column].fillna(0).to_numpy().astype(np.int8))
+    for column in PRICE_COLUMNS:
+        manifest["prices"][column] = array_file(column)
+        values = pd.to_numeric(rows[column], errors="coerce").to_numpy(dtype=np.float64)
+        np.save(os.path.join(target + ".tmp", array_file(column)), values)
+    with open(os.path.join(target + ".tmp", "manifest.json"), "w", encoding="utf-8") as out:
+        json.dump(manifest, out, indent=1)
+    os.rename(target + ".tmp", target)
+
+    # Switch readers over atomically, then drop versions nobody should still be opening
+    pointer = os.path.join(directory, "CURRENT")
+    atomic_write(pointer, lambda out: out.write(version))
+    versions = sorted(name for name in os.listdir(directory) if name != "CURRENT" and not name.endswith(".tmp"))
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    print(f"🧠 Calendar arrays published to '{target}'")
+    return target
+
+
+class SharedCalendar:
+    """Read-only, zero-copy view of the published calendar arrays."""
+
+    def __init__(self, directory=SHARED_CALENDAR_DIR):
+        with open(os.path.join(directory, "CURRENT"), encoding="utf-8") as pointer:
+            self.path = os.path.join(directory, pointer.read().strip())
+        with open(os.path.join(self.path, "manifest.json"), encoding="utf-8") as manifest:
+            self.manifest = json.load(manifest)
+        self.dates = self._map(self.manifest["dates"])
+        self.flags = {column: self._map(name) for column, name in self.manifest["flags"].items()}
+        self.prices = {column: self._map(name) for column, name in self.manifest["prices"].items()}
+
+    def _map(self, name):
+        return np.load(os.path.join(self.path, name), mmap_mode="r")
+
+    def trading_days(self):
+        return self.dates[self.flags["Trading Day"] == 1]
+
+    def expiry_dates(self, column):
+        return self.dates[self.flags[column] == 1]
+
+    def frame(self):
+        """A pandas DataFrame whose columns are the memory-mapped arrays themselves."""
+        columns = {"Calendar Date": self.dates, **self.flags, **self.prices}
+        return pd.DataFrame(columns, copy=False)
 
-    delta = 1
-    max_days = 7  # Max lookback if consecutive holidays
+# ────────────────
+# SQLite export
+# ────────────────
 
-    while delta <= max_days:
-        check_date = datetime.now() - timedelta(days=delta)
-        check_date_web = check_date.strftime("%b %d, %Y")
-        check_date_csv = check_date.strftime("%d-%m-%Y")
+# Calendar.db mirrors the calendar for ad hoc queries from any SQLite client:
+#   SELECT date FROM expiries WHERE instrument = 'BSE Bankex' AND cadence = 'monthly' AND date LIKE '2024%';
+#   SELECT date, "VIX" FROM calendar WHERE "NSE Nifty Monthly Expiry" = 1;
+SQLITE_FILE = os.path.join(SCRIPT_DIR, "Calendar.db")
 
-        # print(f"🔎 Checking for USD/INR price on {check_date_web}...")
 
-        price, matched_date = fetch_usdinr_price(check_date_web)
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
 
-        if price:
-            break
-        else:
-            delta += 1
-
-    if price and matched_date:
-        mask = df["Calendar Date"].dt.strftime("%d-%m-%Y") == check_date_csv
-        if mask.any():
-            df.loc[mask, "USD/INR"] = price
-            print(f"✅Found USD/INR close for {matched_date}: {price}")
-            print("✅USD/INR Close Price updated in DataFrame.")
-        else:
-            print(f"⚠️Date {check_date_csv} not found in DataFrame.")
-    else:
-        print("❌ Could not fetch USD/INR close price.")
 
-    return df
+class CalendarDatabase:
+    """The calendar as an SQLite table keyed on date, plus the long expiry store as `expiries`.
 
-# ───────────────────────────────────────────────
-# EUR/INR
-# ───────────────────────────────────────────────
+    Every expiry flag gets a partial index over the rows where it is set, so
+    "which days were X expiries" reads only those rows. sync() rewrites just the
+    dates in the change list that write_calendar() returned; without one, or when
+    the calendar gained columns, the tables are rebuilt from scratch.
+    """
 
-def update_latest_eurinr_close(df):
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
 
-    def fetch_eurinr_price(date_str_web):
-        """Fetches the EUR/INR close price from the investing.com historical data page."""
-        try:
-            driver = setup_driver()
-            driver.get("https://in.investing.com/currencies/eur-inr-historical-data")
-            # print("🌐 Opened investing.com page...")
+    def close(self):
+        self.conn.close()
 
-            try:
-                WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-                ).click()
-                # print("🍪 Accepted cookies.")
-            except:
-                print("✅No cookie popup or already accepted.")
-
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.XPATH, "//table//tbody/tr"))
+    def columns(self):
+        return [row[1] for row in self.conn.execute("PRAGMA table_info(calendar)")][1:]
+
+    def rebuild(self, df):
+        columns = [column for column in df.columns if column != "Calendar Date"]
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS calendar")
+            self.conn.execute("DROP TABLE IF EXISTS expiries")
+            definitions = ", ".join(
+                f"{quote(column)} REAL" if column in PRICE_COLUMNS else quote(column) for column in columns
             )
+            self.conn.execute(f"CREATE TABLE calendar (date TEXT PRIMARY KEY, {definitions}) WITHOUT ROWID")
+            self.conn.execute(
+                "CREATE TABLE expiries (instrument TEXT, cadence TEXT, date TEXT,"
+                " PRIMARY KEY (instrument, cadence, date)) WITHOUT ROWID"
+            )
+            self.conn.execute("CREATE INDEX expiries_date ON expiries (date)")
+            for column in flag_columns():
+                if column in columns:
+                    index = quote("calendar_" + array_file(column)[:-4])
+                    self.conn.execute(f"CREATE INDEX {index} ON calendar (date) WHERE {quote(column)} = 1")
+            self.upsert(df, columns)
+            self.write_expiries(expiry_store())
+        print(f"🗄️ Rebuilt '{self.path}' with {df['Calendar Date'].notna().sum()} rows.")
+
+    def upsert(self, rows, columns):
+        rows = rows.dropna(subset=["Calendar Date"])
+        dates = [date.date().isoformat() for date in rows["Calendar Date"]]
+        values = zip(dates, *(map(to_json_value, rows[column]) for column in columns))
+        placeholders = ", ".join("?" * (len(columns) + 1))
+        self.conn.executemany(f"INSERT OR REPLACE INTO calendar VALUES ({placeholders})", values)
+
+    def write_expiries(self, store):
+        # A few thousand rows, so the table is simply replaced from the long store
+        self.conn.execute("DELETE FROM expiries")
+        self.conn.executemany("INSERT INTO expiries VALUES (?, ?, ?)", store.rows())
+
+    def sync(self, df, changes=None):
+        columns = [column for column in df.columns if column != "Calendar Date"]
+        if changes is None or self.columns() != columns:
+            self.rebuild(df)
+            return
+        changed = {date for date, _, _, _ in changes}
+        rows = df[df["Calendar Date"].dt.date.isin(changed)]
+        with self.conn:
+            self.upsert(rows, columns)
+            self.write_expiries(expiry_store())
+        print(f"🗄️ Synced {len(rows)} changed row(s) to '{self.path}'.")
+
+
+def export_sqlite(df, changes=None, path=SQLITE_FILE):
+    """Brings Calendar.db up to date with `df`, incrementally when `changes` is given."""
+    database = CalendarDatabase(path)
+    try:
+        database.sync(df, changes)
+    finally:
+        database.close()
 
-            rows = driver.find_elements(By.XPATH, "//table//tbody/tr")
+# ────────────────
+# Event store
+# ────────────────
 
-            for _ in range(10):
-                if any(row.text.strip() for row in rows):
-                    break
-                # print("⌛ Waiting for data to populate...")
-                time.sleep(1)
+# Macro events are rare, so they are kept sparse in Events.csv, one
+# (date, event, value) row each. Dropping CSV files with the same columns into
+# events/ adds or corrects events on the next run. The old dense calendar
+# columns are rendered from the store; join_events() puts any event on demand.
+EVENTS_FILE = os.path.join(SCRIPT_DIR, "Events.csv")
+EVENTS_DIR = os.path.join(SCRIPT_DIR, "events")
+# Event columns in Calendar.csv and the value their rows get on days without an event
+EVENT_COLUMNS = {
+    "RBI Rate Change": 0,
+    "Budget Day": 0,
+    "Tax - GST Collection": float("nan"),
+}
+
+
+class EventStore(CsvStore):
+    """Event values indexed by event name, then date."""
+    header = ["date", "event", "value"]
+
+    def __init__(self, path=EVENTS_FILE):
+        self.path = path
+        self.events = {}   # event -> {date: value}
+        self.dirty = False
+        if os.path.exists(path):
+            self.load()
+
+    def load(self):
+        self.events = {}
+        self.ingest(self.path)
+        self.dirty = False
+
+    def add(self, event, day, value=1.0):
+        """Records one event. Returns True if it was new or changed."""
+        values = self.events.setdefault(event, {})
+        if values.get(day) == value:
+            return False
+        values[day] = value
+        self.dirty = True
+        return True
+
+    def ingest(self, path):
+        """Adds the rows of a date,event[,value] CSV file. Returns how many were new or changed."""
+        added = 0
+        with open(path, newline="", encoding="utf-8") as events:
+            for row in csv.DictReader(events):
+                day = datetime.strptime(row["date"][:10], "%Y-%m-%d").date()
+                value = float(row["value"]) if row.get("value") not in (None, "") else 1.0
+                added += self.add(row["event"], day, value)
+        return added
+
+    def import_dense(self, df):
+        """Seeds the store from the event columns of an existing calendar."""
+        for column in EVENT_COLUMNS:
+            if column not in df.columns:
+                continue
+            values = pd.to_numeric(df[column], errors="coerce")
+            hit = values.notna() & (values != 0) & df["Calendar Date"].notna()
+            for day, value in zip(df.loc[hit, "Calendar Date"].dt.date, values[hit]):
+                self.add(column, day, float(value))
+
+    def dates(self, event):
+        return sorted(self.events.get(event, {}))
+
+    def dense(self, dates, events=None):
+        """One column per event for a Series of dates, with EVENT_COLUMNS' fill value on days without one."""
+        days = dates.dt.date
+        columns = {}
+        for event in events or self.events:
+            values = self.events.get(event, {})
+            columns[event] = days.map(values).astype(float).fillna(EVENT_COLUMNS.get(event, np.nan))
+        return pd.DataFrame(columns, index=dates.index)
+
+    def rows(self):
+        for event, values in sorted(self.events.items()):
+            for day, value in sorted(values.items()):
+                yield day.isoformat(), event, value
+
+
+@cache
+def event_store():
+    """The EventStore shared by every read and write in this process."""
+    return EventStore()
+
+
+def update_events(df, directory=EVENTS_DIR):
+    """Ingests the files in events/ and re-renders the calendar's event columns from the store."""
+    store = event_store()
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".csv"):
+                added = store.ingest(os.path.join(directory, name))
+                if added:
+                    print(f"📅 {added} event(s) added from '{name}'.")
+    dense = store.dense(df["Calendar Date"], list(EVENT_COLUMNS))
+    dated = df["Calendar Date"].notna()
+    for column in EVENT_COLUMNS:
+        # Event values such as a -0.5 rate cut are fractional, so the column is replaced as float
+        df[column] = dense[column].where(dated, pd.to_numeric(df[column], errors="coerce")).astype(float)
+        record_source(df, column, "event store")
+    return df
 
-            for idx, row in enumerate(rows):
-                cols = row.find_elements(By.TAG_NAME, "td")
-                if len(cols) >= 2:
-                    date_text = cols[0].text.strip()
-                    close_price = cols[1].text.strip().replace(",", "")
-                    if clean_date(date_text) == clean_date(date_str_web):
-                        driver.quit()
-                        return float(close_price), date_text
 
-            driver.quit()
-            return None, None
+def join_events(df, events=None):
+    """`df` with a column per event (all stored events by default), for studies that need them."""
+    return df.join(event_store().dense(df["Calendar Date"], events), rsuffix=" (event)")
 
-        except Exception as e:
-            print(f"❌ Error while scraping: {e}")
-            return None, None
 
-    # ──────────────────────────────
-    # Actual update logic with while loop
-    # ──────────────────────────────
+def trading_days_to_event(df, event):
+    """For every trading day, how many trading days until the next `event` (0 on the day itself).
 
-    price = None
-    matched_date = None
+    NaN when there is no later event, or when it falls after the last trading
+    day in the calendar, where the trading days in between are not known yet.
+    """
+    trading = df.loc[(df["Trading Day"] == 1) & df["Calendar Date"].notna(), "Calendar Date"].sort_values()
+    days = trading.dt.normalize().to_numpy(dtype="datetime64[D]")
+    events = np.array(event_store().dates(event), dtype="datetime64[D]")
+    upcoming = np.searchsorted(events, days)
+    result = np.full(len(days), np.nan)
+    has_next = upcoming < len(events)
+    if len(days):
+        has_next[has_next] = events[upcoming[has_next]] <= days[-1]
+    result[has_next] = np.searchsorted(days, events[upcoming[has_next]]) - np.flatnonzero(has_next)
+    return pd.Series(result, index=trading.index, name=f"Trading Days to {event}")
 
-    delta = 1
-    max_days = 7  # Max lookback if consecutive holidays
+# ────────────────
+# Derived analytics
+# ────────────────
 
-    while delta <= max_days:
-        check_date = datetime.now() - timedelta(days=delta)
-        check_date_web = check_date.strftime("%b %d, %Y")
-        check_date_csv = check_date.strftime("%d-%m-%Y")
+# Analytics.csv has one row per trading day: each index's return and realized
+# volatility, and VIX minus Nifty's realized volatility. Nifty Trend in the
+# calendar is 1 when Nifty closed above its TREND_WINDOW-day average, -1 below.
+ANALYTICS_FILE = os.path.join(SCRIPT_DIR, "Analytics.csv")
+ANALYTICS_PRICES = {
+    "Nifty50 Close Price": "Nifty",
+    "Bank Nifty Close Price": "BankNifty",
+    "Fin Nifty Close Price": "FinNifty",
+    "SENSEX": "Sensex",
+}
+VOL_WINDOW = 20     # trading days of returns in the realized volatility
+TREND_WINDOW = 20   # trading days in the average Nifty Trend compares against
+TRADING_DAYS_PER_YEAR = 252
+
+
+def compute_analytics(trading):
+    """Analytics for consecutive trading-day rows; the first window's worth of rows only seeds the rolling values."""
+    if BACKEND == "polars":
+        return compute_analytics_polars(trading)
+    out = pd.DataFrame({"Calendar Date": trading["Calendar Date"]}, index=trading.index)
+    for column, name in ANALYTICS_PRICES.items():
+        prices = pd.to_numeric(trading[column], errors="coerce")
+        out[f"{name} Return"] = prices.pct_change(fill_method=None)
+        log_returns = np.log(prices).diff()
+        out[f"{name} Vol {VOL_WINDOW}D"] = log_returns.rolling(VOL_WINDOW).std() * np.sqrt(TRADING_DAYS_PER_YEAR) * 100
+    out["VIX Spread"] = pd.to_numeric(trading["VIX"], errors="coerce") - out[f"Nifty Vol {VOL_WINDOW}D"]
+    nifty = pd.to_numeric(trading["Nifty50 Close Price"], errors="coerce")
+    out["Nifty Trend"] = np.sign(nifty - nifty.rolling(TREND_WINDOW).mean())
+    return out
+
+
+def update_analytics(df, rebuild=False, path=ANALYTICS_FILE):
+    """Appends analytics for the trading days after the last one in Analytics.csv and fills their Nifty Trend.
+
+    Only those rows plus one window of history are computed. `rebuild`
+    recomputes everything, e.g. after a backfill revised old prices.
+    """
+    trading = df[(df["Trading Day"] == 1) & df["Calendar Date"].notna()].sort_values("Calendar Date")
+    last = None
+    if not rebuild and os.path.exists(path):
+        last = pd.to_datetime(pd.read_csv(path, usecols=["Calendar Date"])["Calendar Date"]).max()
+
+    if last is None or pd.isna(last):
+        computed = compute_analytics(trading)
+    else:
+        position = trading["Calendar Date"].searchsorted(last, side="right")
+        if position == len(trading):
+            print("📈 Analytics already up to date.")
+            return df
+        lookback = max(VOL_WINDOW, TREND_WINDOW) + 1
+        first = max(position - lookback, 0)
+        computed = compute_analytics(trading.iloc[first:]).iloc[position - first:]
+
+    df.loc[computed.index, "Nifty Trend"] = computed["Nifty Trend"]
+    record_source(df, "Nifty Trend", "analytics")
+    rows = computed.drop(columns="Nifty Trend")
+    rows["Calendar Date"] = rows["Calendar Date"].dt.strftime("%Y-%m-%d")
+    if last is None or pd.isna(last):
+        atomic_write(path, lambda out: rows.to_csv(out, index=False))
+    else:
+        with open(path, "a", encoding="utf-8", newline="") as out:
+            rows.to_csv(out, index=False, header=False)
+            out.flush()
+            os.fsync(out.fileno())
+    print(f"📈 Analytics updated for {len(rows)} trading day(s).")
+    return df
 
-        # print(f"🔎 Checking for EUR/INR price on {check_date_web}...")
 
-        price, matched_date = fetch_eurinr_price(check_date_web)
+def expiry_day_stats(path=ANALYTICS_FILE):
+    """Nifty's move and the VIX spread on each instrument's expiry days, next to all other trading days."""
+    analytics = pd.read_csv(path, parse_dates=["Calendar Date"])
+    days = analytics["Calendar Date"].dt.date
+    moves = analytics["Nifty Return"].abs() * 100
+    rows = []
+    for key, expiries in expiry_store().by_instrument.items():
+        hit = days.isin(expiries)
+        rows.append({
+            "Expiry": expiry_column(*key),
+            "Days": int(hit.sum()),
+            "Nifty |Return| %": moves[hit].mean(),
+            "Other Days |Return| %": moves[~hit].mean(),
+            "VIX Spread": analytics.loc[hit, "VIX Spread"].mean(),
+            "Other Days VIX Spread": analytics.loc[~hit, "VIX Spread"].mean(),
+        })
+    return pd.DataFrame(rows).set_index("Expiry").round(3)
 
-        if price:
-            break
-        else:
-            delta += 1
-
-    if price and matched_date:
-        mask = df["Calendar Date"].dt.strftime("%d-%m-%Y") == check_date_csv
-        if mask.any():
-            df.loc[mask, "EUR/INR"] = price
-            print(f"✅Found EUR/INR close for {matched_date}: {price}")
-            print("✅EUR/INR Close Price updated in DataFrame.")
-        else:
-            print(f"⚠️ Date {check_date_csv} not found in DataFrame.")
-    else:
-        print("❌ Could not fetch EUR/INR close price.")
+# ────────────────
+# Expiry cycles
+# ────────────────
 
-    return df
+# Cycles.csv has one row per (instrument_id, cadence, cycle). Cycle n runs from
+# the trading day after expiry n-1 up to and including expiry n, so `open` is the
+# close on expiry n-1. The last cycle of an instrument is usually still running
+# (complete = 0) and is recomputed on the next update; complete cycles are kept.
+CYCLES_FILE = os.path.join(SCRIPT_DIR, "Cycles.csv")
+
+# Price column each instrument's cycles are measured on; the others only get lengths
+UNDERLYING_PRICES = {
+    "NSE Nifty": "Nifty50 Close Price",
+    "NSE BankNifty": "Bank Nifty Close Price",
+    "NSE FinNifty": "Fin Nifty Close Price",
+    "BSE Sensex": "SENSEX",
+}
+
+
+def underlying_close(rows, instrument):
+    """The close of `instrument`'s underlying on each row, or NaN when the calendar has no price for it."""
+    column = UNDERLYING_PRICES.get(instrument)
+    return pd.to_numeric(rows[column], errors="coerce") if column else pd.Series(np.nan, index=rows.index)
+
+
+def compute_cycles(trading, expiries, first_cycle):
+    """Aggregates the cycles in `trading` (sorted trading-day rows whose first row is an expiry).
+
+    The first row only supplies the opening close and VIX; cycle ids count up
+    from `first_cycle` with one cumulative sum over the expiry flags.
+    """
+    if BACKEND == "polars":
+        return compute_cycles_polars(trading, expiries, first_cycle)
+    dates = trading["Calendar Date"].dt.date
+    is_expiry = dates.isin(expiries)
+    frame = pd.DataFrame({
+        "date": dates,
+        "expiry": is_expiry.astype(int),
+        "close": trading["close"],
+        "vix": trading["VIX"],
+        "previous_close": trading["close"].shift(),
+        "previous_vix": trading["VIX"].shift(),
+    }).iloc[1:]
+    frame["cycle"] = first_cycle + frame["expiry"].shift(fill_value=0).cumsum()
+
+    cycles = frame.groupby("cycle").agg(
+        start=("date", "first"),
+        end=("date", "last"),
+        trading_days=("date", "size"),
+        open=("previous_close", "first"),
+        close=("close", "last"),
+        high=("close", "max"),
+        low=("close", "min"),
+        vix_open=("previous_vix", "first"),
+        vix_close=("vix", "last"),
+        complete=("expiry", "last"),
+    )
+    cycles["return"] = cycles["close"] / cycles["open"] - 1
+    cycles["vix_change"] = cycles["vix_close"] - cycles["vix_open"]
+    return cycles.reset_index()
+
+
+def update_cycles(df, rebuild=False, path=CYCLES_FILE):
+    """Brings Cycles.csv up to date: every instrument's running cycle and any that started since."""
+    trading = df[(df["Trading Day"] == 1) & df["Calendar Date"].notna()].sort_values("Calendar Date")
+    trading = trading.assign(VIX=pd.to_numeric(trading["VIX"], errors="coerce"))
+    dates = trading["Calendar Date"].dt.date
+    # Round-trip parsing keeps unchanged rows byte-identical, so an unchanged table is not rewritten
+    stored = (pd.read_csv(path, parse_dates=["start", "end"], float_precision="round_trip")
+              if os.path.exists(path) and not rebuild else None)
+
+    tables = []
+    for (instrument, cadence), expiries in expiry_store().by_instrument.items():
+        expiries = [day for day in expiries if day <= dates.iloc[-1]]
+        if not expiries:
+            continue
+        kept = pd.DataFrame()
+        last_end, first_cycle = expiries[0], 1
+        if stored is not None:
+            own = stored[(stored["instrument_id"] == instrument) & (stored["cadence"] == cadence)]
+            kept = own[own["complete"] == 1]
+            if not kept.empty:
+                last_end, first_cycle = kept["end"].max().date(), int(kept["cycle"].max()) + 1
+                kept = kept.assign(start=kept["start"].dt.date, end=kept["end"].dt.date)
+
+        rows = trading[dates >= last_end]
+        if len(rows) < 2:
+            # Nothing has traded since the last complete cycle
+            tables.append(kept)
+            continue
+        cycles = compute_cycles(rows.assign(close=underlying_close(rows, instrument)), expiries, first_cycle)
+        cycles.insert(0, "cadence", cadence)
+        cycles.insert(0, "instrument_id", instrument)
+        tables.append(pd.concat([kept, cycles], ignore_index=True) if not kept.empty else cycles)
+
+    table = pd.concat(tables, ignore_index=True)
+    text = table.to_csv(index=False)
+    if not rebuild and os.path.exists(path):
+        with open(path, encoding="utf-8", newline="") as current:
+            if current.read() == text:
+                print(f"✅ Expiry cycles in '{path}' are already up to date.")
+                return table
+    atomic_write(path, lambda out: out.write(text))
+    print(f"🔄 Expiry cycles updated in '{path}'.")
+    return table
+
+
+def load_cycles(path=CYCLES_FILE):
+    """Cycles.csv indexed by (instrument_id, cadence, cycle) for direct lookups."""
+    cycles = pd.read_csv(path, parse_dates=["start", "end"])
+    return cycles.set_index(["instrument_id", "cadence", "cycle"]).sort_index()
 
-# ──────────────────────
-# India 10 Y Bond Yield
-# ──────────────────────
+# ────────────────
+# Polars backend
+# ────────────────
 
-def india_10_y_bond_yield(df):
-    driver = setup_driver()
-    driver.get("https://in.investing.com/rates-bonds/india-10-year-bond-yield-historical-data")
+# The derived stages can also run on Polars: each one becomes a single lazy
+# query that Polars optimizes and runs over all cores. pandas stays the default,
+# and check_backends() shows both give the same output.
+BACKENDS = ["pandas", "polars"]
+BACKEND = "pandas"
+BACKEND_RTOL = 1e-9   # rolling sums are accumulated in a different order
 
-    try:
-        WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-        ).click()
-    except Exception as e:
-        print(f"⚠️Failed to accept cookies: {str(e).splitlines()[0]}")
+pl = LazyModule("polars")
 
-    try:
-        table = WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.XPATH, "//table"))
+
+def set_backend(name):
+    global BACKEND
+    if name == "polars" and importlib.util.find_spec("polars") is None:
+        raise SystemExit("The polars backend needs polars: pip install polars")
+    BACKEND = name
+
+
+def polars_frame(trading, columns):
+    """The trading-day rows as a LazyFrame, with NaN as null the way pandas' window functions skip it."""
+    data = {"Calendar Date": trading["Calendar Date"].to_numpy()}
+    for column in columns:
+        data[column] = pd.to_numeric(trading[column], errors="coerce").to_numpy(dtype=np.float64)
+    return pl.DataFrame(data).lazy().with_columns(pl.col(columns).fill_nan(None))
+
+
+def compute_analytics_polars(trading):
+    """compute_analytics() as one lazy Polars query."""
+    names = []
+    expressions = []
+    for column, name in ANALYTICS_PRICES.items():
+        price = pl.col(column)
+        expressions.append((price / price.shift(1) - 1).alias(f"{name} Return"))
+        expressions.append(
+            (price.log().diff().rolling_std(VOL_WINDOW) * np.sqrt(TRADING_DAYS_PER_YEAR) * 100).alias(f"{name} Vol {VOL_WINDOW}D")
         )
-    except Exception as e:
-        print(f"⚠️ Table not found: {e}")
-        driver.quit()
-        return df
+        names += [f"{name} Return", f"{name} Vol {VOL_WINDOW}D"]
+    nifty = pl.col("Nifty50 Close Price")
+    out = (
+        polars_frame(trading, [*ANALYTICS_PRICES, "VIX"])
+        .with_columns(expressions)
+        .with_columns(
+            (pl.col("VIX") - pl.col(f"Nifty Vol {VOL_WINDOW}D")).alias("VIX Spread"),
+            (nifty - nifty.rolling_mean(TREND_WINDOW)).sign().alias("Nifty Trend"),
+        )
+        .select([*names, "VIX Spread", "Nifty Trend"])
+        .collect()
+        .to_pandas()
+    )
+    out.index = trading.index
+    out.insert(0, "Calendar Date", trading["Calendar Date"])
+    return out
+
+
+def compute_cycles_polars(trading, expiries, first_cycle):
+    """compute_cycles() as one lazy Polars query."""
+    dates = trading["Calendar Date"].dt.date
+    frame = polars_frame(trading.assign(expiry=dates.isin(expiries).astype(float)), ["close", "VIX", "expiry"])
+    cycles = (
+        frame.with_columns(
+            pl.col("Calendar Date").dt.date().alias("date"),
+            pl.col("close").shift(1).alias("previous_close"),
+            pl.col("VIX").shift(1).alias("previous_vix"),
+        )
+        .slice(1)
+        .with_columns((first_cycle + pl.col("expiry").shift(1, fill_value=0).cum_sum()).cast(pl.Int64).alias("cycle"))
+        .group_by("cycle", maintain_order=True)
+        .agg(
+            pl.col("date").first().alias("start"),
+            pl.col("date").last().alias("end"),
+            pl.len().alias("trading_days"),
+            pl.col("previous_close").drop_nulls().first().alias("open"),
+            pl.col("close").drop_nulls().last().alias("close"),
+            pl.col("close").max().alias("high"),
+            pl.col("close").min().alias("low"),
+            pl.col("previous_vix").drop_nulls().first().alias("vix_open"),
+            pl.col("VIX").drop_nulls().last().alias("vix_close"),
+            pl.col("expiry").last().cast(pl.Int64).alias("complete"),
+        )
+        .with_columns(
+            (pl.col("close") / pl.col("open") - 1).alias("return"),
+            (pl.col("vix_close") - pl.col("vix_open")).alias("vix_change"),
+        )
+        .collect()
+        .to_pandas()
+    )
+    cycles["start"] = cycles["start"].map(lambda day: day.date())
+    cycles["end"] = cycles["end"].map(lambda day: day.date())
+    return cycles
+
+
+def check_backends(path=CALENDAR_FILE):
+    """Runs the derived stages on both backends and fails unless the outputs match."""
+    df = read_calendar(path)
+    trading = df[(df["Trading Day"] == 1) & df["Calendar Date"].notna()].sort_values("Calendar Date")
+    trading = trading.assign(VIX=pd.to_numeric(trading["VIX"], errors="coerce"))
+    outputs = {}
+    for backend in BACKENDS:
+        set_backend(backend)
+        started = time.perf_counter()
+        analytics = compute_analytics(trading)
+        cycles = {}
+        for key, expiries in expiry_store().by_instrument.items():
+            rows = trading[trading["Calendar Date"].dt.date >= expiries[0]]
+            cycles[key] = compute_cycles(rows.assign(close=underlying_close(rows, key[0])), expiries, 1)
+        outputs[backend] = analytics, cycles
+        print(f"⏱️ {backend:<7} {time.perf_counter() - started:6.2f}s")
+    set_backend("pandas")
+
+    (analytics, cycles), (other_analytics, other_cycles) = outputs["pandas"], outputs["polars"]
+    pd.testing.assert_frame_equal(analytics, other_analytics, rtol=BACKEND_RTOL, check_dtype=False)
+    for key in cycles:
+        pd.testing.assert_frame_equal(cycles[key], other_cycles[key], rtol=BACKEND_RTOL, check_dtype=False)
+    print("✅ pandas and polars backends agree.")
 
-    rows = table.find_elements(By.XPATH, ".//tbody/tr")
-    india_bond_yield = None
-    found_date = None
-
-    delta = 1  # start with yesterday
-    max_days = 7  # Don't go back endlessly, limit to last 7 days
-
-    while delta <= max_days:
-        check_date = datetime.now() - timedelta(days=delta)
-        check_date_web = check_date.strftime("%b %d, %Y")
-        check_date_csv = check_date.strftime("%d-%m-%Y")
-
-        # print(f"🔎 Checking for {check_date_web}...")
-
-        for row in rows:
-            cols = row.find_elements(By.TAG_NAME, "td")
-            if len(cols) >= 2:
-                date_text = cols[0].text.strip()
-                bond_yield = cols[1].text.strip().replace(",", "")
-                if date_text == check_date_web:
-                    india_bond_yield = float(bond_yield)
-                    found_date = check_date_csv
-                    print(f"✅Found India 10 Y Bond Yield for {check_date_web}: {india_bond_yield}")
-                    break
-
-        if india_bond_yield is not None:
-            break  
+# ────────────────
+# Intraday sessions
+# ────────────────
+
+# One row per one-minute bar of every NSE/BSE session: the bar's start time,
+# whether it belongs to a Muhurat session, and that day's expiry flags. Regular
+# sessions run 09:15-15:30 IST; Muhurat sessions are the special Diwali evening
+# hours, usually on a day that is otherwise closed.
+SESSIONS_FILE = os.path.join(SCRIPT_DIR, "Sessions.parquet")
+SESSION_OPEN = (9, 15)
+SESSION_MINUTES = 375   # 09:15 to 15:30
+# One row per Diwali session since 1994: date, open (HH:MM IST) and minutes.
+# A blank open means the hours are not known yet: that day gets no bars at all
+# rather than invented ones, and write_sessions says which days were left out.
+MUHURAT_FILE = os.path.join(SCRIPT_DIR, "Muhurat Sessions.csv")
+IST_OFFSET = 330           # minutes ahead of UTC; IST has no daylight saving
+SESSION_CHUNK_DAYS = 250   # trading days generated and written per row group
+
+pa = LazyModule("pyarrow")
+pq = LazyModule("pyarrow.parquet")
+
+
+@cache
+def muhurat_sessions(path=MUHURAT_FILE):
+    """{date: (open in minutes after midnight, minutes), or None if unknown} for every Muhurat session.
+
+    Read once per process.
+    """
+    sessions = {}
+    with open(path, newline="", encoding="utf-8") as rows:
+        for row in csv.DictReader(rows):
+            if row["open"] and row["minutes"]:
+                hour, minute = map(int, row["open"].split(":"))
+                sessions[parse_date(row["date"])] = (hour * 60 + minute, int(row["minutes"]))
+            else:
+                sessions[parse_date(row["date"])] = None
+    return sessions
+
+
+def session_days(df, start=None, end=None):
+    """(days, opens, minutes): every session day in start..end with its open (minutes after midnight) and length."""
+    trading = df[(df["Trading Day"] == 1) & df["Calendar Date"].notna()]
+    days = {day: (SESSION_OPEN[0] * 60 + SESSION_OPEN[1], SESSION_MINUTES) for day in trading["Calendar Date"].dt.date}
+    unknown = []
+    for day, hours in muhurat_sessions().items():
+        if hours is None:
+            # A Muhurat day is never a regular session, so without its hours it is left out
+            days.pop(day, None)
+            unknown.append(day)
         else:
-            delta += 1
+            days[day] = hours
+    unknown = [day for day in unknown if (not start or day >= start) and (not end or day <= end)]
+    if unknown:
+        print(f"⚠️ Left out {len(unknown)} Muhurat session(s) with unknown hours: "
+              f"{', '.join(str(day) for day in unknown)}. Add them to '{MUHURAT_FILE}'.")
+    selected = sorted(day for day in days if (not start or day >= start) and (not end or day <= end))
+    return (
+        np.array(selected, dtype="datetime64[D]"),
+        np.array([days[day][0] for day in selected], dtype=np.int64),
+        np.array([days[day][1] for day in selected], dtype=np.int64),
+    )
+
 
-    driver.quit()
+def session_chunk(days, opens, minutes, expiries):
+    """The minute bars of a run of session days, built with array arithmetic only."""
+    total = int(minutes.sum())
+    first_bar = np.repeat(np.cumsum(minutes) - minutes, minutes)
+    minute_of_day = np.repeat(opens, minutes) + (np.arange(total) - first_bar)
+    local = np.repeat(days.astype("datetime64[m]"), minutes) + minute_of_day.astype("timedelta64[m]")
+    utc = (local - np.timedelta64(IST_OFFSET, "m")).astype("datetime64[ns]")
+
+    known = [day for day, hours in muhurat_sessions().items() if hours is not None]
+    muhurat = np.isin(days, np.array(known, dtype="datetime64[D]"))
+    columns = {"timestamp": utc, "muhurat": np.repeat(muhurat, minutes)}
+    for key, dates in expiries.items():
+        columns[expiry_column(*key)] = np.repeat(np.isin(days, np.array(dates, dtype="datetime64[D]")), minutes)
+    return columns
+
+
+def write_sessions(df, start=None, end=None, path=SESSIONS_FILE):
+    """Streams the intraday session grid to `path` in SESSION_CHUNK_DAYS row groups. Returns the number of bars."""
+    if importlib.util.find_spec("pyarrow") is None:
+        raise SystemExit("Writing the session grid needs pyarrow: pip install pyarrow")
+    days, opens, minutes = session_days(df, start, end)
+    expiries = dict(expiry_store().by_instrument)
+    schema = pa.schema(
+        [("timestamp", pa.timestamp("ns", tz="Asia/Kolkata")), ("muhurat", pa.bool_())]
+        + [(expiry_column(*key), pa.bool_()) for key in expiries]
+    )
+    bars = 0
+
+    def write(out):
+        nonlocal bars
+        with pq.ParquetWriter(out, schema) as writer:
+            for first in range(0, len(days), SESSION_CHUNK_DAYS):
+                window = slice(first, first + SESSION_CHUNK_DAYS)
+                columns = session_chunk(days[window], opens[window], minutes[window], expiries)
+                columns["timestamp"] = pa.array(columns["timestamp"].view(np.int64),
+                                                type=schema.field("timestamp").type)
+                writer.write_table(pa.table(columns, schema=schema))
+                bars += len(columns["muhurat"])
+
+    atomic_write(path, write, mode="wb")
+    print(f"🕘 Wrote {bars} minute bars over {len(days)} sessions to '{path}'.")
+    return bars
 
-    if india_bond_yield and found_date:
-        mask = df["Calendar Date"].dt.strftime("%d-%m-%Y") == found_date
-        if mask.any():
-            df.loc[mask, "India 10 Y Bond Yield"] = india_bond_yield
-            print(f"✅India 10 Y Bond Yield updated for {found_date} in DataFrame.")
+# ────────────────
+# Backfill
+# ────────────────
+
+# Gap ranges that every source came back empty for, e.g. a US holiday in the
+# Indian trading-day sequence. They are skipped by later gap fills.
+GAP_MISSES_FILE = os.path.join(SCRIPT_DIR, ".backfill_misses.json")
+
+
+# First day each source has history, from "Date from which data is available" in
+# Sources.csv. Gaps before a column's first value are only looked for from here,
+# so the blank leading years of e.g. Bank Nifty and VIX get backfilled too.
+DATA_STARTS = {
+    "Nifty50 Close Price": "1998-05-04",
+    "Bank Nifty Close Price": "2005-10-18",
+    "Fin Nifty Close Price": "2012-02-27",
+    "VIX": "2008-04-17",
+    "USD/INR": "1994-06-30",
+    "EUR/INR": "1994-06-30",
+    "India 10 Y Bond Yield": "1998-02-03",
+    "US 10 Y Bond Yield": "1994-06-30",
+    "Dollar Index": "1994-06-30",
+    "Crude Oil": "1994-06-30",
+}
+
+
+def build_gap_index(df, columns=None, starts=DATA_STARTS):
+    """Returns {column: [(first, last), ...]}: the runs of trading days with no value, per price column.
+
+    Runs follow the `Trading Day` sequence, so weekends and holidays inside a
+    gap don't split it. A column's gaps are counted from its first known value,
+    or from its date in `starts` if that is earlier.
+    """
+    columns = list(columns or PRICE_COLUMNS)
+    starts = starts or {}
+    trading = df[df["Trading Day"] == 1].sort_values("Calendar Date")
+    dates = trading["Calendar Date"].dt.normalize().reset_index(drop=True)
+
+    gaps = {}
+    for column in columns:
+        values = pd.to_numeric(trading[column], errors="coerce").reset_index(drop=True)
+        start = dates[values.notna()].min()
+        if column in starts and (pd.isna(start) or pd.Timestamp(starts[column]) < start):
+            start = pd.Timestamp(starts[column])
+        if pd.isna(start):
+            gaps[column] = []
+            continue
+        missing = values.isna() & (dates >= start)
+        run_ids = (missing != missing.shift()).cumsum()[missing]
+        runs = dates[missing].groupby(run_ids).agg(["min", "max"])
+        gaps[column] = [(first.date(), last.date()) for first, last in runs.itertuples(index=False)]
+    return gaps
+
+
+def print_gap_summary(gaps):
+    for column, ranges in gaps.items():
+        if ranges:
+            print(f"🕳️ {column}: {len(ranges)} gap(s), first {ranges[0][0]}, last {ranges[-1][1]}")
+
+
+def merge_ranges(ranges, max_days=BACKFILL_CHUNK_DAYS):
+    """Joins date ranges into spans of at most `max_days`, so each span costs one history request."""
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and (last - merged[-1][0]).days < max_days:
+            merged[-1] = (merged[-1][0], max(last, merged[-1][1]))
         else:
-            print(f"⚠️ Date {found_date} not found in DataFrame.")
-    else:
-        print("❌ Could not find India 10 Y Bond Yield on website.")
+            merged.append((first, last))
+    return merged
 
-    return df
 
-# ──────────────────────
-# US 10 Y Bond Yield
-# ──────────────────────
+def load_gap_misses(path=GAP_MISSES_FILE):
+    """{column: [(first, last), ...]} of gaps no source had data for."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as misses:
+        return {column: [(datetime.strptime(first, "%Y-%m-%d").date(), datetime.strptime(last, "%Y-%m-%d").date())
+                         for first, last in ranges] for column, ranges in json.load(misses).items()}
 
-def us_10_y_bond_yield(df):
-    driver = setup_driver()
-    driver.get("https://in.investing.com/rates-bonds/u.s.-10-year-bond-yield-historical-data")
 
-    try:
-        WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-        ).click()
-    except Exception as e:
-        print(f"⚠️Failed to accept cookies: {str(e).splitlines()[0]}")
+def save_gap_misses(misses, path=GAP_MISSES_FILE):
+    atomic_write(path, lambda out: json.dump(
+        {column: [[first.isoformat(), last.isoformat()] for first, last in sorted(ranges)]
+         for column, ranges in misses.items()}, out, indent=1))
 
-    try:
-        table = WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.XPATH, "//table"))
-        )
-    except Exception as e:
-        print(f"⚠️ Table not found: {e}")
-        driver.quit()
-        return df
 
-    rows = table.find_elements(By.XPATH, ".//tbody/tr")
-    us_bond_yield = None
-    found_date = None
-
-    delta = 1  # start with yesterday
-    max_days = 7  # Don't go back endlessly, limit to last 7 days
-
-    while delta <= max_days:
-        check_date = datetime.now() - timedelta(days=delta)
-        check_date_web = check_date.strftime("%b %d, %Y")
-        check_date_csv = check_date.strftime("%d-%m-%Y")
-
-        # print(f"🔎 Checking for {check_date_web}...")
-
-        for row in rows:
-            cols = row.find_elements(By.TAG_NAME, "td")
-            if len(cols) >= 2:
-                date_text = cols[0].text.strip()
-                bond_yield = cols[1].text.strip().replace(",", "")
-                if date_text == check_date_web:
-                    us_bond_yield = float(bond_yield)
-                    found_date = check_date_csv
-                    print(f"✅Found US 10 Y Bond Yield for {check_date_web}: {us_bond_yield}")
-                    break
-
-        if us_bond_yield is not None:
-            break  
-        else:
-            delta += 1
+def known_miss(gap, misses):
+    return any(first <= gap[0] and gap[1] <= last for first, last in misses)
 
-    driver.quit()
 
-    if us_bond_yield and found_date:
-        mask = df["Calendar Date"].dt.strftime("%d-%m-%Y") == found_date
-        if mask.any():
-            df.loc[mask, "US 10 Y Bond Yield"] = us_bond_yield
-            print(f"✅US 10 Y Bond Yield updated for {found_date} in DataFrame.")
-        else:
-            print(f"⚠️Date {found_date} not found in DataFrame.")
-    else:
-        print("❌ Could not find US 10 Y Bond Yield on website.")
+def in_ranges(series, ranges):
+    """Keeps the part of a date-indexed Series that falls inside any of the ranges."""
+    keep = pd.Series(False, index=series.index)
+    for first, last in ranges:
+        keep |= (series.index >= pd.Timestamp(first)) & (series.index <= pd.Timestamp(last))
+    return series[keep]
 
-    return df
 
+async def fetch_history_ranges(ranges_by_column, concurrency=MAX_CONCURRENCY):
+    """Fetches the given date ranges per column, all sources in parallel.
+
+    Columns with an investing.com pair id use its date-ranged API. Whatever that
+    cannot serve comes from one yfinance bulk download spanning the ranges.
+    Returns ({column: Series of closes by date}, columns whose history request failed).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(source, ranges):
+        parts = []
+        for first, last in ranges:
+            async with semaphore:
+                parts.append(await source.fetch_range_async(session, first, last))
+        return pd.concat(parts).sort_index() if parts else pd.Series(dtype=float)
+
+    ranged = [INVESTING_BY_COLUMN[column] for column, ranges in ranges_by_column.items()
+              if ranges and column in INVESTING_BY_COLUMN and INVESTING_BY_COLUMN[column].pair_id]
+    async with aiohttp.ClientSession(headers=HTTP_HEADERS) as session:
+        results = await asyncio.gather(
+            *(fetch_one(source, ranges_by_column[source.column]) for source in ranged), return_exceptions=True
+        )
+
+    history = {}
+    failed = set()
+    for source, result in zip(ranged, results):
+        if isinstance(result, Exception):
+            print(f"❌ investing.com history failed for {source.column}: {result!r}")
+            failed.add(source.column)
+        elif result.empty:
+            print(f"❌ investing.com returned no history for {source.column}.")
+        else:
+            history[source.column] = result[~result.index.duplicated(keep="last")].rename("investing.com history")
+
+    leftover = [column for column, ranges in ranges_by_column.items()
+                if ranges and column not in history and column in YF_TICKERS]
+    if leftover:
+        first = min(ranges_by_column[column][0][0] for column in leftover)
+        last = max(ranges_by_column[column][-1][1] for column in leftover)
+        closes = await asyncio.to_thread(
+            cached_closes, [YF_TICKERS[column] for column in leftover], first, last + timedelta(days=1)
+        )
+        for column in leftover:
+            series = in_ranges(closes[YF_TICKERS[column]].dropna(), ranges_by_column[column])
+            if not series.empty:
+                history[column] = series.rename("yfinance")
+                failed.discard(column)
+    return history, failed
+
+
+def backfill(df, start=None, end=None, columns=None, overwrite=False, gaps=None):
+    """Fills price columns in a single merge, either for start..end or for the gaps in the calendar.
+
+    Without a date range only the gap index ranges are requested, so data the
+    calendar already has is never fetched again, and gaps no source had data
+    for before are skipped. Only blank cells are filled unless `overwrite` is
+    set. Returns the DataFrame and the columns nothing could be fetched for.
+    """
+    columns = list(columns or PRICE_COLUMNS)
+    misses = None
+    if start and end:
+        ranges_by_column = {column: [(start, end)] for column in columns}
+    else:
+        gaps = gaps if gaps is not None else build_gap_index(df, columns)
+        misses = load_gap_misses()
+        gaps = {column: [gap for gap in gaps.get(column, []) if not known_miss(gap, misses.get(column, []))]
+                for column in columns}
+        ranges_by_column = {column: merge_ranges(gaps[column]) for column in columns}
+    wanted = [column for column in columns if ranges_by_column[column]]
+    if not wanted:
+        print("✅ No gaps to fill.")
+        return df, []
+
+    history, failed = asyncio.run(fetch_history_ranges({column: ranges_by_column[column] for column in wanted}))
+    if misses is not None:
+        for column in wanted:
+            if column in failed:
+                continue
+            if column in history:
+                empty = [gap for gap in gaps[column] if in_ranges(history[column], [gap]).empty]
+            else:
+                empty = gaps[column]
+            if empty:
+                misses[column] = misses.get(column, []) + empty
+        save_gap_misses(misses)
+    if not history:
+        return df, wanted
+
+    dates = df["Calendar Date"].dt.normalize()
+    fetched = pd.DataFrame(history).reindex(dates.values)
+    fetched.index = df.index
+    for column in fetched.columns:
+        current = pd.to_numeric(df[column], errors="coerce")
+        take = fetched[column].notna() if overwrite else fetched[column].notna() & current.isna()
+        df[column] = current.where(~take, fetched[column])
+        record_source(df, column, f"backfill ({history[column].name})")
+        print(f"✅{column} backfilled for {int(take.sum())} day(s).")
+
+    return df, [column for column in wanted if column not in history]
+
+
+def columns_needing_update(df, columns=None, end_date=None):
+    """Price columns that don't yet have a value for the latest weekday up to `end_date` (default: yesterday)."""
+    end_date = end_date or (datetime.now() - timedelta(days=1)).date()
+    while end_date.weekday() >= 5:
+        end_date -= timedelta(days=1)
+    row = df["Calendar Date"].dt.normalize() == pd.Timestamp(end_date)
+    return [column for column in (columns or PRICE_COLUMNS)
+            if pd.to_numeric(df.loc[row, column], errors="coerce").isna().all()]
+
+
+def resolve_columns(names):
+    """Maps source names (vix, gold) or calendar column names to calendar columns."""
+    unknown = [name for name in names if name not in INVESTING_BY_NAME and name not in PRICE_COLUMNS]
+    if unknown:
+        raise SystemExit(f"Unknown source(s): {', '.join(unknown)}. "
+                         f"Choose from {', '.join(list(INVESTING_BY_NAME) + PRICE_COLUMNS)}.")
+    return [INVESTING_BY_NAME[name].column if name in INVESTING_BY_NAME else name for name in names]
+
+
+def run_backfill(start=None, end=None, names=None, path=CALENDAR_FILE):
+    """Backfills start..end, or every gap in the calendar when no range is given."""
+    start = datetime.strptime(start, "%Y-%m-%d").date() if start else None
+    end = datetime.strptime(end, "%Y-%m-%d").date() if end else None
+    df = read_calendar(path)
+    columns = resolve_columns(names) if names else None
+    gaps = None
+    if not start:
+        gaps = build_gap_index(df, columns)
+        print_gap_summary(gaps)
+    df, missing = backfill(df, start, end, columns, gaps=gaps)
+    if missing:
+        print(f"⚠️ No history found for: {', '.join(missing)}")
+    df = recompute_calendar(df)
+    df = update_analytics(df, rebuild=True)
+    update_cycles(df, rebuild=True)
+    changes = write_calendar(df, path)
+    print(f"✅Backfill saved to '{path}'")
+    if changes:
+        publish_calendar_arrays(df)
+        export_sqlite(df, changes)
 
 # ────────────────
-# Dollar Index
+# Daemon mode
 # ────────────────
 
-def update_latest_dollar_index_close(df):
-    def fetch_dollar_price(date_str_web):
-        """Fetches the Dollar Index close price from the investing.com historical data page."""
-        driver = None
-        try:
-            driver = setup_driver()
-            driver.get("https://in.investing.com/indices/usdollar-historical-data")
-            # print("🌐 Opened investing.com page...")
+# (time zone, hour, minute) each market closes at
+MARKET_CLOSES = {
+    "NSE": ("Asia/Kolkata", 15, 30),
+    "BSE": ("Asia/Kolkata", 15, 30),
+    "INDIA_FX": ("Asia/Kolkata", 17, 0),
+    "US": ("America/New_York", 16, 0),
+    "COMMODITIES": ("America/New_York", 17, 0),
+}
+CLOSE_GRACE = timedelta(minutes=20)   # time for investing.com to publish the final close
+RETRY_AFTER = timedelta(minutes=30)
+MAX_RETRIES = 4
+
+
+class WarmBrowser:
+    """One Chrome kept open between daemon jobs, restarted if it dies."""
 
+    def __init__(self):
+        self.driver = None
+
+    def get(self):
+        if self.driver is not None:
             try:
-                WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-                ).click()
-                print("🍪 Accepted cookies.")
+                self.driver.current_url  # cheap liveness check
             except Exception:
-                print("✅ No cookie popup or already accepted.")
+                self.quit()
+        if self.driver is None:
+            self.driver = setup_driver()
+        return self.driver
 
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.XPATH, "//table//tbody/tr"))
-            )
+    def quit(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+
+def next_close(market, after):
+    """Returns when to fetch `market` next after the aware datetime `after`, and that session's date."""
+    zone_name, hour, minute = MARKET_CLOSES[market]
+    local_after = after.astimezone(ZoneInfo(zone_name))
+    session = local_after.date()
+    while True:
+        run_at = datetime.combine(session, datetime.min.time(), ZoneInfo(zone_name)).replace(hour=hour, minute=minute)
+        run_at += CLOSE_GRACE
+        if session.weekday() < 5 and run_at > local_after:
+            return run_at, session
+        session += timedelta(days=1)
+
+
+def update_market(df, market, session_date, browser):
+    """Fetches the session close of every source on `market` and recomputes the calendar when Nifty moved."""
+    columns = [source.column for source in INVESTING_SOURCES if source.market == market]
+    df, missing = update_prices(df, columns, end_date=session_date, max_days=1)
+    if missing:
+        df, missing = browser_fallback(df, missing, driver=browser.get, end_date=session_date, max_days=1)
+    if "Nifty50 Close Price" in columns and "Nifty50 Close Price" not in missing:
+        df = recompute_calendar(df)
+        df = update_analytics(df)
+        update_cycles(df)
+    return df, missing
+
+
+def run_daemon(path=CALENDAR_FILE):
+    """Keeps the calendar in memory and updates each market right after it closes."""
+    global change_server
+    df = read_calendar(path)
+    browser = WarmBrowser()
+    change_server = ChangeFeedServer()
+    change_server.start()
+    now = datetime.now(timezone.utc)
+    queue = []
+    for market in sorted({source.market for source in INVESTING_SOURCES}):
+        run_at, session = next_close(market, now)
+        heapq.heappush(queue, (run_at.astimezone(timezone.utc), market, session, 0))
+
+    print("🕰️ Calendar daemon started.")
+    try:
+        while queue:
+            run_at, market, session, attempt = heapq.heappop(queue)
+            wait = (run_at - datetime.now(timezone.utc)).total_seconds()
+            if wait > 0:
+                print(f"💤 Next: {market} close of {session} at {run_at.astimezone():%Y-%m-%d %H:%M}.")
+                time.sleep(wait)
+
+            print(f"🔔 Updating {market} for {session}...")
+            try:
+                df, missing = update_market(df, market, session, browser)
+                changes = write_calendar(df, path)
+                if changes:
+                    publish_calendar_arrays(df)
+                    export_sqlite(df, changes)
+                print(f"💾 Calendar saved after {market} update.")
+            except Exception as e:
+                # One bad job must not stop the daemon; retry it like a missing close
+                print(f"❌ {market} update for {session} failed: {e!r}")
+                missing = [market]
+
+            if missing and attempt < MAX_RETRIES:
+                print(f"🔁 Retrying {', '.join(missing)} in {RETRY_AFTER}.")
+                heapq.heappush(queue, (run_at + RETRY_AFTER, market, session, attempt + 1))
+            else:
+                next_run, next_session = next_close(market, datetime.combine(session, datetime.max.time(), timezone.utc))
+                heapq.heappush(queue, (next_run.astimezone(timezone.utc), market, next_session, 0))
+    except KeyboardInterrupt:
+        print("👋 Calendar daemon stopped.")
+    finally:
+        browser.quit()
+        change_server.close()
+        change_server = None
 
-            rows = driver.find_elements(By.XPATH, "//table//tbody/tr")
-
-            # Wait for data if rows are initially empty
-            for _ in range(10):
-                if any(row.text.strip() for row in rows):
-                    break
-                # print("⌛ Waiting for data to populate...")
-                time.sleep(1)
-                rows = driver.find_elements(By.XPATH, "//table//tbody/tr")
-
-            for idx, row in enumerate(rows):
-                cols = row.find_elements(By.TAG_NAME, "td")
-                if len(cols) >= 2:
-                    date_text = cols[0].text.strip()
-                    close_price = cols[1].text.strip().replace(",", "")
-                    if clean_date(date_text) == clean_date(date_str_web):
-                        print(f"✅ Found Dollar Index close for {date_text}: {close_price}")
-                        return float(close_price), date_text
-
-            print("⚠️ Dollar Index close price for the given date not found.")
-            return None, None
+# ────────────────
+# Main logic
+# ────────────────
 
-        except Exception as e:
-            print(f"❌ Error while scraping Dollar Index: {e}")
-            return None, None
+# Stages `run --only` accepts: "prices", "trading-day", "expiries" (all of
+# them), "events", "analytics", or single expiry stages by name, e.g. "nifty-weekly,bankex-monthly".
+PIPELINE_STAGES = ["prices", "trading-day", "expiries", "events", "analytics"]
+
+
+def resolve_stages(names):
+    """Splits stage names into (pipeline stages to run, expiry columns or None for all)."""
+    names = set(PIPELINE_STAGES if names is None else names)
+    by_name = {expiry_stage_name(expiry_column(*key)): expiry_column(*key) for key in EXPIRY_RULES}
+    unknown = names - set(PIPELINE_STAGES) - set(by_name)
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(sorted(unknown))}. "
+                         f"Choose from {', '.join(PIPELINE_STAGES + list(by_name))}.")
+    if "expiries" in names:
+        expiries = None
+    else:
+        expiries = [by_name[name] for name in names if name in by_name]
+    return names & set(PIPELINE_STAGES), expiries
+
+
+def main(deadline_seconds=RUN_DEADLINE, stages=None, sources=None, dry_run=False, workers=None, path=CALENDAR_FILE):
+    """Runs the requested stages (all by default) over the calendar, loaded once, and saves the result.
+
+    `sources` picks the price columns to fetch, even if they already have a value.
+    With `dry_run` nothing is written and the time each stage took is printed.
+    """
+    deadline = RunDeadline(deadline_seconds)
+    stages, expiries = resolve_stages(stages)
+    timings = []
+    started = time.perf_counter()
+    df = read_calendar(path)
+    timings.append(("read", time.perf_counter() - started))
+
+    still_missing = []
+    if "prices" in stages:
+        started = time.perf_counter()
+        if sources:
+            columns = resolve_columns(sources)
+        else:
+            columns = columns_needing_update(df)
+            skipped = [column for column in PRICE_COLUMNS if column not in columns]
+            if skipped:
+                print(f"⏭️ Already up to date: {', '.join(skipped)}")
+        df, missing = update_prices(df, columns, deadline=deadline) if columns else (df, [])
+        print("✅Price providers finished!")
+        df, still_missing = browser_fallback(df, missing, deadline)
+        print_host_stats()
+        timings.append(("prices", time.perf_counter() - started))
+
+    if "trading-day" in stages or expiries != []:
+        started = time.perf_counter()
+        df = recompute_calendar(df, "trading-day" in stages, expiries, workers)
+        timings.append(("recompute", time.perf_counter() - started))
+
+    if "events" in stages:
+        started = time.perf_counter()
+        df = update_events(df)
+        timings.append(("events", time.perf_counter() - started))
+
+    if "analytics" in stages and not dry_run:
+        started = time.perf_counter()
+        df = update_analytics(df)
+        update_cycles(df)
+        timings.append(("analytics", time.perf_counter() - started))
+
+    if dry_run:
+        for stage, seconds in timings:
+            print(f"⏱️ {stage:<10} {seconds:7.2f}s")
+        print("🧪 Dry run: nothing was saved.")
+        return df
 
-        finally:
-            if driver:
-                try:
-                    driver.quit()
-                    print("🚗 WebDriver closed successfully.")
-                except Exception as e:
-                    print(f"⚠️ WebDriver close error: {e}")
+    # Save whatever was collected, even if some sources missed the deadline
+    changes = write_calendar(df, path)
+    print(f"✅All updates applied, {len(changes)} changed cell(s) saved to '{path}'")
+    if changes or not os.path.exists(os.path.join(SHARED_CALENDAR_DIR, "CURRENT")):
+        publish_calendar_arrays(df)
+    if changes or not os.path.exists(SQLITE_FILE):
+        export_sqlite(df, changes if os.path.exists(SQLITE_FILE) else None)
+    if still_missing:
+        print(f"⚠️ Not updated this run: {', '.join(still_missing)}")
+    print(f"⏱️ Run took {deadline.seconds - deadline.remaining():.0f}s of its {deadline.seconds}s deadline.")
+    return df
 
-    # --- MAIN EXECUTION PART ---
-    try:
-        price, matched_date = fetch_dollar_price(date_web)
 
-        if price and matched_date:
-            mask = df["Calendar Date"].dt.strftime("%d-%m-%Y") == date_csv
-            if mask.any():
-                df.loc[mask, "Dollar Index"] = price
-                print("✅Dollar Index Close Price updated in DataFrame.")
+def export(path=CALENDAR_FILE):
+    """Rebuilds Calendar.db and republishes the shared arrays from the saved calendar."""
+    df = read_calendar(path)
+    expiry_store().save()
+    publish_calendar_arrays(df)
+    export_sqlite(df)
+
+
+def run_analytics(rebuild=False, stats=False, path=CALENDAR_FILE):
+    df = update_analytics(read_calendar(path), rebuild)
+    update_cycles(df, rebuild)
+    changes = write_calendar(df, path)
+    if changes:
+        publish_calendar_arrays(df)
+        export_sqlite(df, changes)
+    if stats:
+        print(expiry_day_stats().to_string())
+
+
+def run_events(until=None, path=CALENDAR_FILE):
+    df = update_events(read_calendar(path))
+    changes = write_calendar(df, path)
+    if changes:
+        publish_calendar_arrays(df)
+        export_sqlite(df, changes)
+    for event in event_store().events:
+        dates = event_store().dates(event)
+        print(f"📅 {event}: {len(dates)} event(s), last on {dates[-1]}")
+    if until:
+        # Count from the latest trading day up to today, not from the last day that has an event after it
+        countdown = trading_days_to_event(df, until)
+        dates = df.loc[countdown.index, "Calendar Date"]
+        countdown = countdown[dates.dt.normalize() <= pd.Timestamp.now().normalize()]
+        if countdown.empty:
+            print(f"No upcoming {until} in the calendar.")
+        elif pd.isna(countdown.iloc[-1]):
+            since = dates[countdown.index[-1]].date()
+            later = [day for day in event_store().dates(until) if day > since]
+            if later:
+                print(f"⏳ Next {until} is on {later[0]}, past the calendar's last trading day "
+                      f"({since}); the trading-day countdown is unknown.")
             else:
-                print("⚠️ Date not found in DataFrame.")
+                print(f"No upcoming {until} in the calendar.")
         else:
-            print("❌ Could not fetch Dollar Index close price.")
+            print(f"⏳ {int(countdown.iloc[-1])} trading day(s) from {dates[countdown.index[-1]]:%Y-%m-%d} to the next {until}.")
 
-    except Exception as e:
-        print(f"❌ Unexpected error in updating Dollar Index: {e}")
 
-    return df
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
 
-# ────────────────
-# Crude Oil
-# ────────────────
 
-def update_latest_crudeoil_close(df):
+def split_names(value):
+    return [name.strip() for name in value.split(",") if name.strip()]
 
-    def fetch_crude_price():
-        """Fetches the Crude Oil close price from the investing.com historical data page."""
-        try:
-            driver = setup_driver()
-            driver.get("https://in.investing.com/commodities/crude-oil-historical-data")
 
-            try:
-                WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-                ).click()
-                print("🍪 Accepted cookies.")
-            except:
-                print("✅No cookie popup or already accepted.")
-
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.XPATH, "//table//tbody/tr"))
-            )
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="Calendar.py", description="Maintains the trading and expiry calendar.")
+    parser.add_argument("--backend", choices=BACKENDS, default=BACKEND, help="engine for the derived stages")
+    commands = parser.add_subparsers(dest="command")
 
-            rows = driver.find_elements(By.XPATH, "//table//tbody/tr")
-            for _ in range(10):
-                if any(row.text.strip() for row in rows):
-                    break
-                time.sleep(1)
+    run = commands.add_parser("run", help="fetch prices and recompute the calendar (the default)")
+    run.add_argument("--only", type=split_names, metavar="STAGES",
+                     help="comma separated stages: prices, trading-day, expiries, or e.g. nifty-weekly")
+    run.add_argument("--sources", type=split_names, metavar="NAMES",
+                     help="comma separated sources to fetch, e.g. vix,gold (fetched even if already present)")
+    run.add_argument("--dry-run", action="store_true", help="time the stages without saving anything")
+    run.add_argument("--deadline", type=int, default=RUN_DEADLINE, help="seconds the whole run may take")
+    run.add_argument("--workers", type=int, help=f"processes for the expiry rules (default {EXPIRY_WORKERS})")
 
-            return rows, driver  # <-- return both rows and driver
+    recompute = commands.add_parser("recompute", help="recompute trading days and expiries without any network")
+    recompute.add_argument("--only", type=split_names, metavar="STAGES",
+                           help="comma separated stages: trading-day, expiries, or e.g. nifty-weekly")
+    recompute.add_argument("--dry-run", action="store_true", help="time the stages without saving anything")
+    recompute.add_argument("--workers", type=int, help=f"processes for the expiry rules (default {EXPIRY_WORKERS})")
 
-        except Exception as e:
-            print(f"❌ Error while scraping: {e}")
-            driver.quit()
-            return [], None
+    backfill_range = commands.add_parser("backfill", help="fill a date range from the history API")
+    backfill_range.add_argument("start", help="first date, YYYY-MM-DD")
+    backfill_range.add_argument("end", help="last date, YYYY-MM-DD")
+    backfill_range.add_argument("--sources", type=split_names, metavar="NAMES")
 
-    rows, driver = fetch_crude_price()
+    fill_gaps = commands.add_parser("fill-gaps", help="fetch only the trading days that have no value")
+    fill_gaps.add_argument("--sources", type=split_names, metavar="NAMES")
 
-    if not rows or not driver:
-        print("❌ No data fetched.")
-        return df
+    analytics = commands.add_parser("analytics", help="update Analytics.csv, Cycles.csv and Nifty Trend without any network")
+    analytics.add_argument("--rebuild", action="store_true", help="recompute every trading day, not just new ones")
+    analytics.add_argument("--stats", action="store_true", help="print Nifty moves and VIX spread on expiry days")
 
-    crude_oil_price = None
-    found_date = None
+    sessions = commands.add_parser("sessions", help="write the one-minute intraday session grid")
+    sessions.add_argument("--start", type=parse_date, help="first date, YYYY-MM-DD")
+    sessions.add_argument("--end", type=parse_date, help="last date, YYYY-MM-DD")
+    sessions.add_argument("--output", default=SESSIONS_FILE, help=f"Parquet file to write (default {SESSIONS_FILE})")
 
-    delta = 1  # Start with yesterday
-    max_days = 7
+    events = commands.add_parser("events", help="ingest events/ and show trading days to the next event")
+    events.add_argument("--until", metavar="EVENT", help="event to count trading days to, e.g. 'Budget Day'")
 
-    try:
-        while delta <= max_days:
-            check_date = datetime.now() - timedelta(days=delta)
-            check_date_web = check_date.strftime("%b %d, %Y")
-            check_date_csv = check_date.strftime("%d-%m-%Y")
-
-            for row in rows:
-                cols = row.find_elements(By.TAG_NAME, "td")
-                if len(cols) >= 2:
-                    date_text = cols[0].text.strip()
-                    close_price = cols[1].text.strip().replace(",", "")
-                    if clean_date(date_text) == clean_date(check_date_web):
-                        crude_oil_price = float(close_price)
-                        found_date = check_date_csv
-                        print(f"✅Found Crude Oil close for {check_date_web}: {crude_oil_price}")
-                        break
-
-            if crude_oil_price is not None:
-                break
-            else:
-                delta += 1
+    commands.add_parser("check-backends", help="run the derived stages on pandas and polars and compare")
+    commands.add_parser("daemon", help="stay running and update each market after it closes")
+    commands.add_parser("export", help="rebuild Calendar.db and the shared arrays")
+    return parser.parse_args(argv)
 
-    finally:
-        driver.quit()  # <-- quit the driver after you're done
 
-    if crude_oil_price and found_date:
-        mask = df["Calendar Date"].dt.strftime("%d-%m-%Y") == found_date
-        if mask.any():
-            df.loc[mask, "Crude Oil"] = crude_oil_price
-            print(f"✅Crude Oil close price updated for {found_date} in DataFrame.")
+def cli(argv=None):
+    args = parse_args(argv)
+    set_backend(args.backend)
+    if args.command in (None, "run"):
+        if args.command is None:
+            main()
         else:
-            print(f"⚠️Date {found_date} not found in DataFrame.")
-    else:
-        print("❌ Could not find Crude Oil close price on website.")
-
-    return df
-
-# ────────────────
-# Main logic
-# ────────────────
-def main():
-    input_file = "Calendar.csv"
-    df = pd.read_csv(input_file)
-    
-    df["Calendar Date"] = pd.to_datetime(df["Calendar Date"], errors="coerce")
-
-    
-    df = update_latest_nifty_close(df)
-    print("✅Nifty50 CLose price Column Updated Successfully!")
-    df = update_trading_day(df)
-    print("✅Trading Day Column Updated Successfully!")
-    df = apply_weekly_expiry(df)
-    print("✅NSE Nifty Weekly Expiry Column Updated Successfully!")
-    df = apply_nifty_monthly_expiry(df)
-    print("✅NSE Nifty Monthly Expiry Column Updated Successfully!")
-    df = apply_banknifty_weekly_expiry(df)
-    print("✅NSE BankNifty Weekly Expiry Column Updated Successfully!")
-    df = apply_banknifty_monthly_expiry(df)
-    print("✅NSE BankNifty Monthly Expiry Column Updated Successfully!")
-    df = apply_FinNifty_weekly_expiry(df)
-    print("✅NSE FinNifty Weekly Expiry Column Updated Successfully!")
-    df = apply_finnifty_monthly_expiry(df)
-    print("✅NSE FinNifty Monthly Expiry Column Updated Successfully!")
-    df = apply_bse_sensex_weekly_expiry(df)
-    print("✅BSE Sensex Weekly Expiry Column Updated Successfully!")
-    df = apply_bse_sensex_monthly_expiry(df)
-    print("✅BSE Sensex Monthly Expiry Column Updated Successfully!")
-    df = apply_sensex50_monthly_expiry(df)
-    print("✅BSE Sensex50 Monthly Expiry Columns Updated Successfully!")
-    df = bse_bankex_weekly_expiry(df)
-    print("✅BSE Bankex Weekly Expiry Columns Updated Successfully!")
-    df = bse_bankex_monthly_expiry(df)
-    print("✅BSE Bankex Monthly Expiry Columns Updated Successfully!")
-    df = bse_sensex50_weekly_expiry(df)
-    print("✅BSE Sensex50 Weekly Expiry Columns Updated Successfully!")
-    df = update_latest_banknifty_close(df)
-    print("✅NSE BankNifty Close price Column Updated Successfully!")
-    df = update_finnifty_close_price(df)
-    print("✅FinNifty Close price Column Updated Successfully!")
-    df = update_vix(df)
-    print("✅VIX Column Updated Successfully!")
-    df = update_latest_sensex_close(df)
-    print("✅Sensex Column Updated Successfully!")
-    df = update_latest_gold_close(df)
-    print("✅Gold USD Price Column Updated Successfully!")
-    df = update_latest_usdinr_close(df)
-    print("✅USD/INR Column Updated Successfully!")
-    df = update_latest_eurinr_close(df)
-    print("✅EUR/INR Column Updated Successfully!")
-    df = india_10_y_bond_yield(df)
-    print("✅India 10 Y Bond Yield Column Updated Successfully!")
-    df = us_10_y_bond_yield(df)
-    print("✅US 10 Y Bond Yield Column Updated Successfully!")
-    df= update_latest_dollar_index_close(df)
-    print("✅Dollar Index Column Updated Successfully!")
-    df = update_latest_crudeoil_close(df)
-    print("✅Crude Oil Column Updated Successfully!")
-
-
-
-    # Save to new CSV
-    df.to_csv("Calendar.csv", index=False)
-    print("✅All updates applied and saved to 'Calendar1.csv'")
+            main(args.deadline, args.only, args.sources, args.dry_run, args.workers)
+    elif args.command == "recompute":
+        stages = [stage for stage in (args.only or PIPELINE_STAGES) if stage != "prices"]
+        main(stages=stages, dry_run=args.dry_run, workers=args.workers)
+    elif args.command == "backfill":
+        run_backfill(args.start, args.end, args.sources)
+    elif args.command == "fill-gaps":
+        run_backfill(names=args.sources)
+    elif args.command == "analytics":
+        run_analytics(args.rebuild, args.stats)
+    elif args.command == "sessions":
+        write_sessions(read_calendar(), args.start, args.end, args.output)
+    elif args.command == "events":
+        run_events(args.until)
+    elif args.command == "check-backends":
+        check_backends()
+    elif args.command == "daemon":
+        run_daemon()
+    elif args.command == "export":
+        export()
 
 
 if __name__ == "__main__":
-    main()
+    cli()
@@ -0,0 +1,177 @@
+"""Query-only access to the calendar: trading days and expiries.
+
+Uses nothing outside the standard library, so a service that only needs
+"is today an expiry?" starts in milliseconds instead of importing pandas,
+yfinance and selenium through Calendar.py. It reads the Calendar.db mirror
+that every run keeps up to date, and falls back to Calendar.csv (with its
+delta log applied) and Expiries.csv when the database has not been exported yet.
+
+    import calendar_core
+    calendar_core.is_expiry("NSE Nifty Weekly Expiry")
+    calendar_core.next_expiry("BSE Sensex Monthly Expiry", date(2025, 4, 1))
+"""
+import csv
+import json
+import os
+import sqlite3
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CALENDAR_FILE = os.path.join(HERE, "Calendar.csv")
+SQLITE_FILE = os.path.join(HERE, "Calendar.db")
+EXPIRY_FILE = "Expiries.csv"   # next to whichever Calendar.csv is read
+
+
+def to_day(day):
+    if day is None:
+        return date.today()
+    if isinstance(day, str):
+        return datetime.strptime(day[:10], "%Y-%m-%d").date()
+    return day.date() if isinstance(day, datetime) else day
+
+
+class CalendarIndex:
+    """Sorted trading days and expiry dates, held as date ordinals for bisecting."""
+
+    def __init__(self, trading_days, expiries):
+        self.trading_days = sorted(trading_days)
+        self.expiries = {column: sorted(days) for column, days in expiries.items()}
+
+    @classmethod
+    def from_database(cls, path=SQLITE_FILE):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            trading_days = [date.fromisoformat(row[0]).toordinal()
+                            for row in conn.execute('SELECT date FROM calendar WHERE "Trading Day" = 1')]
+            expiries = {}
+            for instrument, cadence, day in conn.execute("SELECT instrument, cadence, date FROM expiries"):
+                column = f"{instrument} {cadence.title()} Expiry"
+                expiries.setdefault(column, []).append(date.fromisoformat(day).toordinal())
+        finally:
+            conn.close()
+        return cls(trading_days, expiries)
+
+    @classmethod
+    def from_csv(cls, path=CALENDAR_FILE):
+        rows = {}
+        with open(path, newline="", encoding="utf-8") as snapshot:
+            reader = csv.DictReader(snapshot)
+            columns = [column for column in reader.fieldnames if column == "Trading Day" or column.endswith(" Expiry")]
+            for row in reader:
+                if row["Calendar Date"]:
+                    rows[row["Calendar Date"][:10]] = {column: row[column] for column in columns}
+
+        # Cells saved since the last compaction live in the delta log
+        delta_path = os.path.splitext(path)[0] + ".delta.jsonl"
+        if os.path.exists(delta_path):
+            with open(delta_path, encoding="utf-8") as log:
+                for line in log:
+                    try:
+                        cell = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if cell["column"] in columns and cell["date"][:10] in rows:
+                        rows[cell["date"][:10]][cell["column"]] = cell["value"]
+
+        def is_set(value):
+            try:
+                return float(value) == 1
+            except (TypeError, ValueError):
+                return False
+
+        flags = {column: [] for column in columns}
+        for day, row in rows.items():
+            ordinal = date.fromisoformat(day).toordinal()
+            for column in columns:
+                if is_set(row[column]):
+                    flags[column].append(ordinal)
+        trading_days = flags.pop("Trading Day", [])
+
+        # The long expiry store also has the instruments without a calendar column
+        expiry_path = os.path.join(os.path.dirname(path), EXPIRY_FILE)
+        if os.path.exists(expiry_path):
+            flags = {}
+            with open(expiry_path, newline="", encoding="utf-8") as store:
+                for row in csv.DictReader(store):
+                    column = f"{row['instrument_id']} {row['cadence'].title()} Expiry"
+                    flags.setdefault(column, []).append(date.fromisoformat(row["expiry_date"]).toordinal())
+        return cls(trading_days, flags)
+
+    def is_trading_day(self, day=None):
+        return self._contains(self.trading_days, to_day(day).toordinal())
+
+    def is_expiry(self, column, day=None):
+        return self._contains(self.expiry_days(column), to_day(day).toordinal())
+
+    def next_expiry(self, column, day=None):
+        """The first `column` expiry on or after `day`, or None."""
+        days = self.expiry_days(column)
+        i = bisect_left(days, to_day(day).toordinal())
+        return date.fromordinal(days[i]) if i < len(days) else None
+
+    def previous_trading_day(self, day=None):
+        """The last trading day strictly before `day`, or None."""
+        i = bisect_left(self.trading_days, to_day(day).toordinal())
+        return date.fromordinal(self.trading_days[i - 1]) if i else None
+
+    def next_trading_day(self, day=None):
+        """The first trading day strictly after `day`, or None."""
+        i = bisect_right(self.trading_days, to_day(day).toordinal())
+        return date.fromordinal(self.trading_days[i]) if i < len(self.trading_days) else None
+
+    def expiry_days(self, column):
+        if column not in self.expiries:
+            raise KeyError(f"Unknown expiry column: {column!r}")
+        return self.expiries[column]
+
+    @staticmethod
+    def _contains(days, ordinal):
+        i = bisect_left(days, ordinal)
+        return i < len(days) and days[i] == ordinal
+
+
+_calendar = None
+_loaded_version = None
+
+
+def file_version(*paths):
+    """The mtimes of `paths` (None for a missing file), to notice when a run rewrote them."""
+    return tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else None for path in paths)
+
+
+def load_calendar(database=SQLITE_FILE, path=CALENDAR_FILE):
+    """The CalendarIndex used by the module-level helpers, reloaded whenever its files change."""
+    global _calendar, _loaded_version
+    if os.path.exists(database):
+        version = ("db",) + file_version(database)
+    else:
+        version = ("csv",) + file_version(path, os.path.splitext(path)[0] + ".delta.jsonl",
+                                          os.path.join(os.path.dirname(path), EXPIRY_FILE))
+    if _calendar is None or version != _loaded_version:
+        if version[0] == "db":
+            _calendar = CalendarIndex.from_database(database)
+        else:
+            _calendar = CalendarIndex.from_csv(path)
+        _loaded_version = version
+    return _calendar
+
+
+def is_trading_day(day=None):
+    return load_calendar().is_trading_day(day)
+
+
+def is_expiry(column, day=None):
+    return load_calendar().is_expiry(column, day)
+
+
+def next_expiry(column, day=None):
+    return load_calendar().next_expiry(column, day)
+
+
+def previous_trading_day(day=None):
+    return load_calendar().previous_trading_day(day)
+
+
+def next_trading_day(day=None):
+    return load_calendar().next_trading_day(day)
@@ -0,0 +1,49 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Calendar  # noqa: E402
+
+
+def write_snapshot(path):
+    df = pd.DataFrame({
+        "Calendar Date": pd.date_range("2025-04-24", periods=3),
+        "Day of the week": ["Thursday", "Friday", "Saturday"],
+        "Trading Day": [1, 1, 0],
+    })
+    for column in Calendar.PRICE_COLUMNS:
+        df[column] = [10.0, 11.0, np.nan]
+    df.to_csv(path, index=False)
+
+
+def test_log_that_only_clears_cells_replays(tmp_path):
+    path = str(tmp_path / "Calendar.csv")
+    write_snapshot(path)
+    store = Calendar.CalendarStore(path)
+    df = store.load()
+    df.loc[1, "VIX"] = np.nan
+    assert store.save(df)
+
+    df = Calendar.CalendarStore(path).read()
+    assert np.isnan(df.loc[1, "VIX"])
+    assert df.loc[0, "VIX"] == 10.0
+    assert df["VIX"].dtype == float
+
+
+def test_replay_keeps_integer_and_text_columns(tmp_path):
+    path = str(tmp_path / "Calendar.csv")
+    write_snapshot(path)
+    store = Calendar.CalendarStore(path)
+    df = store.load()
+    df.loc[1, "Trading Day"] = 0
+    df.loc[2, "Day of the week"] = "Holiday"
+    store.save(df)
+
+    df = Calendar.CalendarStore(path).read()
+    assert df["Trading Day"].tolist() == [1, 0, 0]
+    assert df["Trading Day"].dtype == np.int64
+    assert df.loc[2, "Day of the week"] == "Holiday"